@@ -0,0 +1,97 @@
+"""Baseline schema (users, goals, tasks)
+
+Creates the original tables on an empty database. Databases created earlier by
+Base.metadata.create_all() are left as they are, apart from the goal/task
+columns that used to be added by the ad-hoc migrate_db.py script.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _add_missing_columns(inspector, table_name, columns):
+    existing = {column["name"] for column in inspector.get_columns(table_name)}
+    for column in columns:
+        if column.name not in existing:
+            op.add_column(table_name, column)
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+
+    if "users" not in tables:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("email", sa.String(), nullable=False),
+            sa.Column("username", sa.String(), nullable=False),
+            sa.Column("hashed_password", sa.String(), nullable=False),
+            sa.Column("first_name", sa.String(), nullable=True),
+            sa.Column("last_name", sa.String(), nullable=True),
+            sa.Column("is_active", sa.Boolean(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+        )
+        op.create_index("ix_users_id", "users", ["id"])
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
+        op.create_index("ix_users_username", "users", ["username"], unique=True)
+
+    if "goals" not in tables:
+        op.create_table(
+            "goals",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("title", sa.String(), nullable=False),
+            sa.Column("description", sa.Text(), nullable=True),
+            sa.Column("deadline", sa.DateTime(), nullable=True),
+            sa.Column("category", sa.String(), nullable=True),
+            sa.Column("priority", sa.String(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        )
+        op.create_index("ix_goals_id", "goals", ["id"])
+    else:
+        _add_missing_columns(inspector, "goals", [
+            sa.Column("category", sa.String(), nullable=True),
+            sa.Column("priority", sa.String(), nullable=True, server_default="medium"),
+        ])
+
+    if "tasks" not in tables:
+        op.create_table(
+            "tasks",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("title", sa.String(), nullable=False),
+            sa.Column("description", sa.Text(), nullable=True),
+            sa.Column("status", sa.Enum("NOT_STARTED", "IN_PROGRESS", "COMPLETED", name="taskstatus"), nullable=True),
+            sa.Column("due_date", sa.DateTime(), nullable=True),
+            sa.Column("completed_at", sa.DateTime(), nullable=True),
+            sa.Column("priority", sa.String(), nullable=True),
+            sa.Column("estimated_hours", sa.Integer(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+            sa.Column("goal_id", sa.Integer(), sa.ForeignKey("goals.id"), nullable=False),
+        )
+        op.create_index("ix_tasks_id", "tasks", ["id"])
+    else:
+        _add_missing_columns(inspector, "tasks", [
+            sa.Column("priority", sa.String(), nullable=True, server_default="medium"),
+            sa.Column("estimated_hours", sa.Integer(), nullable=True),
+        ])
+
+
+def downgrade() -> None:
+    op.drop_table("tasks")
+    op.drop_table("goals")
+    op.drop_table("users")
+    sa.Enum(name="taskstatus").drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,38 @@
+"""Composite indexes for per-user goal and task queries
+
+Every task query joins goals on goal_id and filters on goals.user_id plus
+tasks.status, due_date, completed_at or created_at. These indexes let those
+queries use index range scans instead of scanning the tasks table.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_goals_user_id_created_at", "goals", ["user_id", "created_at", "id"]),
+    ("ix_goals_user_id_deadline", "goals", ["user_id", "deadline"]),
+    ("ix_tasks_goal_id_status", "tasks", ["goal_id", "status"]),
+    ("ix_tasks_goal_id_due_date", "tasks", ["goal_id", "due_date", "id"]),
+    ("ix_tasks_goal_id_completed_at", "tasks", ["goal_id", "completed_at"]),
+    ("ix_tasks_goal_id_created_at", "tasks", ["goal_id", "created_at", "id"]),
+]
+
+
+def upgrade() -> None:
+    # if_not_exists: tables created by Base.metadata.create_all() already have them
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
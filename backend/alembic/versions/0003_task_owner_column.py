@@ -0,0 +1,61 @@
+"""Denormalize the goal owner onto tasks
+
+Adds tasks.user_id, backfills it from goals.user_id and replaces the
+goal_id-based composite indexes used for user-scoped task scans with
+user_id-based ones, so those scans no longer join goals.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+OLD_INDEXES = [
+    ("ix_tasks_goal_id_due_date", ["goal_id", "due_date", "id"]),
+    ("ix_tasks_goal_id_completed_at", ["goal_id", "completed_at"]),
+    ("ix_tasks_goal_id_created_at", ["goal_id", "created_at", "id"]),
+]
+
+NEW_INDEXES = [
+    ("ix_tasks_user_id_status", ["user_id", "status"]),
+    ("ix_tasks_user_id_due_date", ["user_id", "due_date", "id"]),
+    ("ix_tasks_user_id_completed_at", ["user_id", "completed_at"]),
+    ("ix_tasks_user_id_created_at", ["user_id", "created_at", "id"]),
+]
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("tasks") as batch_op:
+        batch_op.add_column(sa.Column("user_id", sa.Integer(), nullable=True))
+
+    op.execute(
+        "UPDATE tasks SET user_id = (SELECT goals.user_id FROM goals WHERE goals.id = tasks.goal_id)"
+    )
+
+    with op.batch_alter_table("tasks") as batch_op:
+        batch_op.alter_column("user_id", existing_type=sa.Integer(), nullable=False)
+        batch_op.create_foreign_key("fk_tasks_user_id_users", "users", ["user_id"], ["id"])
+
+    for name, _ in OLD_INDEXES:
+        op.drop_index(name, table_name="tasks", if_exists=True)
+    for name, columns in NEW_INDEXES:
+        op.create_index(name, "tasks", columns, if_not_exists=True)
+
+
+def downgrade() -> None:
+    for name, _ in NEW_INDEXES:
+        op.drop_index(name, table_name="tasks", if_exists=True)
+    for name, columns in OLD_INDEXES:
+        op.create_index(name, "tasks", columns, if_not_exists=True)
+
+    with op.batch_alter_table("tasks") as batch_op:
+        batch_op.drop_constraint("fk_tasks_user_id_users", type_="foreignkey")
+        batch_op.drop_column("user_id")
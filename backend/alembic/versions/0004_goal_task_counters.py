@@ -0,0 +1,38 @@
+"""Stored task counters on goals
+
+Adds goals.total_tasks and goals.completed_tasks, maintained by the ORM
+when tasks are created, deleted or change status, and fills them from the
+tasks table.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("goals") as batch_op:
+        batch_op.add_column(sa.Column("total_tasks", sa.Integer(), nullable=False, server_default="0"))
+        batch_op.add_column(sa.Column("completed_tasks", sa.Integer(), nullable=False, server_default="0"))
+
+    op.execute(
+        "UPDATE goals SET "
+        "total_tasks = (SELECT COUNT(tasks.id) FROM tasks WHERE tasks.goal_id = goals.id), "
+        "completed_tasks = (SELECT COUNT(tasks.id) FROM tasks "
+        "WHERE tasks.goal_id = goals.id AND tasks.status = 'COMPLETED')"
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("goals") as batch_op:
+        batch_op.drop_column("completed_tasks")
+        batch_op.drop_column("total_tasks")
@@ -0,0 +1,44 @@
+"""Daily progress rollup
+
+Adds daily_progress (tasks created and completed per user and UTC day),
+maintained by the ORM when tasks are written, and fills it from the tasks
+table.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "daily_progress",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("created_tasks", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("completed_tasks", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+    op.execute(
+        "INSERT INTO daily_progress (user_id, day, created_tasks, completed_tasks) "
+        "SELECT user_id, day, SUM(created_tasks), SUM(completed_tasks) FROM ("
+        "SELECT user_id, DATE(created_at) AS day, 1 AS created_tasks, 0 AS completed_tasks "
+        "FROM tasks WHERE created_at IS NOT NULL "
+        "UNION ALL "
+        "SELECT user_id, DATE(completed_at) AS day, 0 AS created_tasks, 1 AS completed_tasks "
+        "FROM tasks WHERE completed_at IS NOT NULL"
+        ") AS events GROUP BY user_id, day"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("daily_progress")
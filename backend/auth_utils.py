@@ -1,12 +1,19 @@
+import asyncio
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import select, event, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
 from database import get_db
 from models import User
+from cache_utils import TTLCache
 import os
 from dotenv import load_dotenv
 
@@ -20,6 +27,26 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt worker pool: number of threads and how many extra calls may wait for one
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "16"))
+
+# Authenticated-user cache (keyed by token subject)
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+
+# Verified-token cache (keyed by the token's SHA-256 digest): max entries and seconds an entry
+# is kept; entries never outlive the token's own exp
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", "300"))
+
+# Put the user id in access tokens so get_current_identity needs no user lookup; the identity
+# then reflects the user as of login (renames and deletions apply when the token is reissued)
+TOKEN_EMBED_IDENTITY = os.getenv("TOKEN_EMBED_IDENTITY", "false").lower() in ("1", "true", "yes")
+
+# Usernames allowed to use the admin endpoints (comma separated)
+ADMIN_USERNAMES = {name.strip() for name in os.getenv("ADMIN_USERNAMES", "").split(",") if name.strip()}
+
 # HTTP Bearer for token authentication
 security = HTTPBearer()
 
@@ -31,6 +58,75 @@ def get_password_hash(password: str) -> str:
     """Generate password hash."""
     return pwd_context.hash(password)
 
+class PasswordHashPool:
+    """Bounded thread pool that keeps bcrypt work off the event loop.
+
+    bcrypt releases the GIL while hashing, so threads give real parallelism.
+    When every worker is busy and the wait queue is full, calls are rejected
+    immediately with 503 instead of piling up behind a login storm.
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_queue: int = PASSWORD_HASH_MAX_QUEUE):
+        self.workers = workers
+        self.max_queue = max_queue
+        # Created on first use, so the pool works again after shutdown() (e.g. a second app lifespan)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._in_flight = 0
+        self.rejected = 0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of calls waiting for a free worker."""
+        return max(0, self._in_flight - self.workers)
+
+    async def run(self, func, *args):
+        """Run `func(*args)` on the pool, or raise 503 if the pool is saturated."""
+        if self._in_flight >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication service is busy, please retry shortly",
+                headers={"Retry-After": "1"},
+            )
+        
+        self._in_flight += 1
+        try:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self._in_flight -= 1
+
+    def shutdown(self) -> None:
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+password_pool = PasswordHashPool()
+
+@dataclass(frozen=True)
+class UserIdentity:
+    """Compact identity of the authenticated user, cached between requests."""
+    id: int
+    username: str
+    is_active: bool
+
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL)
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_cached_user(mapper, connection, target):
+    """Drop cached identities when a user row changes (including renames)."""
+    user_cache.invalidate(target.username)
+    for old_username in inspect(target).attrs.username.history.deleted:
+        user_cache.invalidate(old_username)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create JWT access token."""
     to_encode = data.copy()
@@ -43,8 +139,30 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """Verify JWT token and return username."""
+def decode_token(token: str) -> dict:
+    """Verify a JWT and return its claims, from the verified-token cache when possible.
+    
+    The cache is keyed by a digest of the whole token, so any altered token misses it and
+    goes through full signature verification. Raises JWTError for invalid tokens.
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    claims = token_cache.get(key)
+    if claims is not None:
+        return claims
+    
+    claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    remaining = claims.get("exp", 0) - time.time()
+    # Tokens without exp are never cached
+    if remaining > 0:
+        token_cache.set(key, claims, ttl=min(TOKEN_CACHE_TTL, remaining))
+    return claims
+
+async def verify_token_claims(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
+    """Verify JWT token and return its claims.
+    
+    Async so FastAPI calls it on the event loop: decoding is cheap (and usually a
+    token cache hit), far cheaper than a hop through the threadpool.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -52,19 +170,22 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     )
     
     try:
-        token = credentials.credentials
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
+        claims = decode_token(credentials.credentials)
     except JWTError:
         raise credentials_exception
+    if claims.get("sub") is None:
+        raise credentials_exception
     
-    return username
+    return claims
+
+async def verify_token(claims: dict = Depends(verify_token_claims)):
+    """Verify JWT token and return username."""
+    return claims["sub"]
 
-def get_current_user(db: Session = Depends(get_db), username: str = Depends(verify_token)):
+async def get_current_user(db: AsyncSession = Depends(get_db), username: str = Depends(verify_token)):
     """Get current authenticated user."""
-    user = db.query(User).filter(User.username == username).first()
+    result = await db.execute(select(User).where(User.username == username))
+    user = result.scalars().first()
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -72,11 +193,47 @@ def get_current_user(db: Session = Depends(get_db), username: str = Depends(veri
         )
     return user
 
-def authenticate_user(db: Session, username: str, password: str):
+async def get_current_identity(db: AsyncSession = Depends(get_db), claims: dict = Depends(verify_token_claims)) -> UserIdentity:
+    """Get the authenticated user's identity, from the token or the user cache when possible.
+    
+    Use this instead of get_current_user when only the id is needed.
+    """
+    username = claims["sub"]
+    if "uid" in claims:
+        # Issued with TOKEN_EMBED_IDENTITY: the identity as of login, without a lookup
+        return UserIdentity(id=claims["uid"], username=username, is_active=True)
+    
+    identity = user_cache.get(username)
+    if identity is None:
+        result = await db.execute(select(User.id, User.username, User.is_active).where(User.username == username))
+        row = result.first()
+        if row is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="User not found"
+            )
+        identity = UserIdentity(id=row.id, username=row.username, is_active=row.is_active)
+        user_cache.set(username, identity)
+    return identity
+
+async def get_admin_identity(current_user: User = Depends(get_current_user)) -> UserIdentity:
+    """Get the authenticated admin's identity, or raise 403 unless they are listed in ADMIN_USERNAMES.
+    
+    Always checks the database, so revoking admin access does not wait for tokens to expire.
+    """
+    if current_user.username not in ADMIN_USERNAMES or not current_user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return UserIdentity(id=current_user.id, username=current_user.username, is_active=current_user.is_active)
+
+async def authenticate_user(db: AsyncSession, username: str, password: str):
     """Authenticate user with username and password."""
-    user = db.query(User).filter(User.username == username).first()
+    result = await db.execute(select(User).where(User.username == username))
+    user = result.scalars().first()
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    if not await password_pool.run(verify_password, password, user.hashed_password):
         return False
     return user 
\ No newline at end of file
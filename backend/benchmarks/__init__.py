@@ -0,0 +1 @@
+# Benchmarks and query-plan checks for the Personal Learning Tracker API
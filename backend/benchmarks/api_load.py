@@ -0,0 +1,313 @@
+"""
+Load benchmark of the API: latency percentiles, throughput and queries per request.
+
+Seeds a throwaway database (SQLite by default, or --database-url for a local
+PostgreSQL) with --users users, each with --goals goals of --tasks tasks, then
+drives main.app in-process through httpx at each --concurrency level with a
+fixed mix of auth, goal, task and dashboard requests (including task status
+updates). The mix is seeded, so runs with the same arguments send the same
+requests. Every table is dropped before and after the run, so a database that
+already has tables is refused unless --reset is given.
+
+--save writes the results as a baseline; --compare checks a run against one and
+exits with status 1 when an endpoint's p95 latency or queries per request grew
+by more than --tolerance. The run is refused when the baseline was recorded with
+a different database, seed size, concurrency, request count or cache setting.
+Latency baselines are only comparable on the same machine (a warning is printed
+otherwise); query counts are comparable anywhere.
+
+Usage (from the backend directory):
+    python -m benchmarks.api_load [--database-url URL [--reset]] [--users 20] [--goals 10] [--tasks 10]
+        [--concurrency 1,8,32] [--requests 300] [--no-cache]
+        [--save benchmarks/baselines/sqlite.json] [--compare benchmarks/baselines/sqlite.json]
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import math
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+PASSWORD = "benchmark-password"
+
+# (label, weight, method, url template); {goal_id} and {task_id} belong to the requesting user
+REQUEST_MIX = [
+    ("GET /api/auth/me", 1, "GET", "/api/auth/me"),
+    ("GET /api/goals/", 3, "GET", "/api/goals/?limit=20"),
+    ("GET /api/goals/{id}", 2, "GET", "/api/goals/{goal_id}"),
+    ("GET /api/tasks/", 3, "GET", "/api/tasks/?limit=50"),
+    ("GET /api/dashboard/", 2, "GET", "/api/dashboard/"),
+    ("GET /api/dashboard/progress", 1, "GET", "/api/dashboard/progress?days=30"),
+    ("PATCH /api/tasks/{id}/status", 1, "PATCH", "/api/tasks/{task_id}/status?status={status}"),
+]
+
+# Queries issued by the request running in the current task
+request_queries: contextvars.ContextVar = contextvars.ContextVar("request_queries", default=None)
+
+
+def seed(engine, users: int, goals_per_user: int, tasks_per_goal: int) -> Dict[int, Dict[str, List[int]]]:
+    """Insert users, goals and tasks; returns each user's goal and task ids."""
+    from sqlalchemy import insert
+    from models import User, Goal, Task, TaskStatus, recompute_goal_counters, rebuild_daily_progress
+    from auth_utils import get_password_hash
+
+    now = datetime.utcnow()
+    rng = random.Random(42)
+    statuses = list(TaskStatus)
+    hashed_password = get_password_hash(PASSWORD)
+    owned = {}
+    goal_rows, task_rows = [], []
+    goal_id = task_id = 0
+    for u in range(1, users + 1):
+        owned[u] = {"goals": [], "tasks": []}
+        for _ in range(goals_per_user):
+            goal_id += 1
+            owned[u]["goals"].append(goal_id)
+            goal_rows.append({
+                "id": goal_id, "title": f"Goal {goal_id}", "user_id": u,
+                "created_at": now - timedelta(days=rng.randint(0, 365)),
+                "deadline": now + timedelta(days=rng.randint(-30, 60)),
+            })
+            for _ in range(tasks_per_goal):
+                task_id += 1
+                owned[u]["tasks"].append(task_id)
+                status = rng.choice(statuses)
+                created = now - timedelta(days=rng.randint(0, 60))
+                task_rows.append({
+                    "id": task_id, "title": f"Task {task_id}", "goal_id": goal_id, "user_id": u, "status": status,
+                    "created_at": created,
+                    "due_date": created + timedelta(days=rng.randint(1, 60)),
+                    "completed_at": created + timedelta(days=rng.randint(0, 30)) if status == TaskStatus.COMPLETED else None,
+                })
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": u, "email": f"user{u}@example.com", "username": f"user{u}", "hashed_password": hashed_password}
+            for u in range(1, users + 1)
+        ])
+        if goal_rows:
+            conn.execute(insert(Goal), goal_rows)
+        if task_rows:
+            conn.execute(insert(Task), task_rows)
+        # Bulk inserts skip the ORM hooks that maintain these
+        recompute_goal_counters(conn)
+        rebuild_daily_progress(conn)
+    return owned
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(samples: List[tuple], elapsed: float) -> Dict:
+    latencies = sorted(latency for latency, _, _ in samples)
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for _, _, ok in samples if not ok),
+        "throughput": round(len(samples) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "queries_per_request": round(sum(queries for _, queries, _ in samples) / len(samples), 2) if samples else 0.0,
+    }
+
+
+async def login_all(client, users: int, concurrency: int) -> Dict[int, Dict[str, str]]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def login(u: int):
+        async with semaphore:
+            response = await client.post("/api/auth/login", json={"username": f"user{u}", "password": PASSWORD})
+            response.raise_for_status()
+            return u, {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    return dict(await asyncio.gather(*(login(u) for u in range(1, users + 1))))
+
+
+async def run_level(client, headers, owned, concurrency: int, total: int, rng: random.Random) -> Dict:
+    """Send `total` requests from the mix with `concurrency` in flight; results per endpoint and overall."""
+    weights = [weight for _, weight, _, _ in REQUEST_MIX]
+    plan = []
+    for _ in range(total):
+        label, _, method, template = rng.choices(REQUEST_MIX, weights)[0]
+        user = rng.choice(list(owned))
+        url = template.format(
+            goal_id=rng.choice(owned[user]["goals"]),
+            task_id=rng.choice(owned[user]["tasks"]),
+            status=rng.choice(["not_started", "in_progress", "completed"])
+        )
+        plan.append((label, method, url, headers[user]))
+
+    samples = defaultdict(list)
+    queue = iter(plan)
+
+    async def worker():
+        for label, method, url, request_headers in queue:
+            queries = [0]
+            request_queries.set(queries)
+            start = time.perf_counter()
+            response = await client.request(method, url, headers=request_headers)
+            latency = (time.perf_counter() - start) * 1000
+            samples[label].append((latency, queries[0], response.status_code < 400))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    results = {label: summarize(samples[label], elapsed) for label, _, _, _ in REQUEST_MIX if samples[label]}
+    results["all"] = summarize([sample for values in samples.values() for sample in values], elapsed)
+    return results
+
+
+async def benchmark(args, owned) -> Dict:
+    import httpx
+    from sqlalchemy import event
+    from database import async_engine
+    from main import app, lifespan
+
+    def count_query(*_):
+        queries = request_queries.get()
+        if queries is not None:
+            queries[0] += 1
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count_query)
+    rng = random.Random(7)
+    results = {}
+    async with lifespan(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            start = time.perf_counter()
+            headers = await login_all(client, len(owned), int(os.getenv("PASSWORD_HASH_WORKERS", "2")))
+            print(f"Logged in {len(owned)} users in {time.perf_counter() - start:.1f}s")
+            # Warm caches and connections so the first level is not penalised
+            await run_level(client, headers, owned, 1, min(args.requests, 50), random.Random(0))
+            for concurrency in args.concurrency:
+                results[str(concurrency)] = await run_level(client, headers, owned, concurrency, args.requests, rng)
+                print_level(concurrency, results[str(concurrency)])
+    return results
+
+
+def print_level(concurrency: int, results: Dict) -> None:
+    print(f"\nconcurrency {concurrency}")
+    print(f"{'endpoint':<32} {'reqs':>5} {'err':>4} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8} {'queries':>8}")
+    for label, stats in results.items():
+        print(
+            f"{label:<32} {stats['requests']:>5} {stats['errors']:>4} {stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f}"
+            f" {stats['p99_ms']:>8.2f} {stats['throughput']:>8.1f} {stats['queries_per_request']:>8.2f}"
+        )
+
+
+# Settings that change what is measured; a baseline is only comparable when they all match
+COMPARED_SETTINGS = ("database", "users", "goals", "tasks", "concurrency", "requests", "cache")
+
+
+def settings_mismatches(settings: Dict, baseline: Dict) -> List[str]:
+    """Settings of the current run that differ from the baseline's, as messages."""
+    recorded = baseline.get("settings", {})
+    return [
+        f"{key}: baseline {recorded.get(key)!r}, this run {settings[key]!r}"
+        for key in COMPARED_SETTINGS
+        if recorded.get(key) != settings[key]
+    ]
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Regressions of `results` against a saved baseline, as messages."""
+    regressions = []
+    for level, endpoints in baseline["results"].items():
+        for label, before in endpoints.items():
+            after = results.get(level, {}).get(label)
+            if after is None:
+                continue
+            # Cache hits vary a little with scheduling, so query counts get the same relative slack
+            if after["queries_per_request"] > before["queries_per_request"] * (1 + tolerance):
+                regressions.append(
+                    f"[c={level}] {label}: {before['queries_per_request']} -> {after['queries_per_request']} queries/request"
+                )
+            if after["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+                regressions.append(f"[c={level}] {label}: p95 {before['p95_ms']} -> {after['p95_ms']} ms")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="defaults to a temporary SQLite file")
+    parser.add_argument("--reset", action="store_true", help="drop the tables of a --database-url that already has some")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--goals", type=int, default=10, help="goals per user")
+    parser.add_argument("--tasks", type=int, default=10, help="tasks per goal")
+    parser.add_argument("--concurrency", type=lambda value: [int(level) for level in value.split(",")], default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=300, help="requests per concurrency level")
+    parser.add_argument("--no-cache", action="store_true", help="disable the response and dashboard stats caches")
+    parser.add_argument("--save", help="write the results to this baseline file")
+    parser.add_argument("--compare", help="compare against this baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed growth of p95 and queries/request (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    # The database modules read their settings at import time
+    os.environ["DATABASE_URL"] = args.database_url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "api_load.db")
+    os.environ["SCHEDULER_ENABLED"] = "false"
+    if args.no_cache:
+        os.environ["RESPONSE_CACHE_BACKEND"] = "none"
+        os.environ["DASHBOARD_STATS_MAX_STALENESS"] = "0"
+
+    from sqlalchemy import inspect
+    from database import engine, Base
+    import models  # noqa: F401 (registers the tables)
+    existing = inspect(engine).get_table_names()
+    if existing and not args.reset:
+        sys.exit(f"The database already has tables ({', '.join(existing)}); pass --reset to drop them and all their data")
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    settings = {
+        "database": engine.dialect.name, "users": args.users, "goals": args.goals, "tasks": args.tasks,
+        "concurrency": args.concurrency, "requests": args.requests, "cache": not args.no_cache,
+        "python": platform.python_version(), "machine": platform.machine(),
+    }
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        # Checked before the run so a mismatch fails fast instead of reporting meaningless regressions
+        mismatches = settings_mismatches(settings, baseline)
+        if mismatches:
+            print(f"{args.compare} was recorded with different settings:")
+            print("\n".join(f"  {message}" for message in mismatches))
+            sys.exit(1)
+        if any(baseline["settings"].get(key) != settings[key] for key in ("python", "machine")):
+            print(f"Warning: {args.compare} was recorded on another Python or machine; latencies may not be comparable")
+
+    owned = seed(engine, args.users, args.goals, args.tasks)
+    print(f"Seeded {args.users} users x {args.goals} goals x {args.tasks} tasks")
+
+    results = asyncio.run(benchmark(args, owned))
+    Base.metadata.drop_all(engine)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump({"settings": settings, "results": results}, f, indent=2)
+        print(f"\nSaved baseline to {args.save}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.compare}:")
+            print("\n".join(f"  {message}" for message in regressions))
+            sys.exit(1)
+        print(f"\nNo regressions against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Measure the per-request cost of authentication.
+
+First times token verification alone: a full jose.jwt.decode against a hit in
+the verified-token cache. Then drives a minimal endpoint that depends only on
+get_current_identity (next to the same endpoint without auth) through the
+ASGI stack, in each mode:
+
+    db lookup       no token cache, no user cache: decode and a user query per request
+    user cache      user cache only (the previous default)
+    token cache     token and user caches
+    embedded id     token cache and a token carrying the user id (TOKEN_EMBED_IDENTITY)
+
+and reports microseconds of auth overhead per request (relative to the no-auth
+endpoint) and queries per request.
+
+Usage (from the backend directory):
+    python -m benchmarks.auth_overhead [--requests 2000] [--rounds 3] [--repeat 20000]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from datetime import timedelta
+
+
+def time_per_call(func, repeat: int) -> float:
+    """Mean microseconds per call."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+async def drive(client, url: str, headers: dict, requests: int, queries: list) -> tuple:
+    """Median microseconds per request and queries per request."""
+    queries[0] = 0
+    samples = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = await client.get(url, headers=headers)
+        samples.append((time.perf_counter() - start) * 1e6)
+        response.raise_for_status()
+    return statistics.median(samples), queries[0] / requests
+
+
+async def benchmark(args) -> None:
+    import httpx
+    from fastapi import Depends, FastAPI
+    from sqlalchemy import event, insert
+    from database import async_engine, Base
+    from models import User
+    import auth_utils
+    from auth_utils import create_access_token, get_current_identity, UserIdentity
+
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), [{"id": 1, "email": "user@example.com", "username": "user", "hashed_password": "x"}])
+
+    queries = [0]
+
+    def count_query(*_):
+        queries[0] += 1
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count_query)
+
+    app = FastAPI()
+
+    @app.get("/plain")
+    async def plain():
+        return {"id": 1}
+
+    @app.get("/auth")
+    async def authenticated(current_user: UserIdentity = Depends(get_current_identity)):
+        return {"id": current_user.id}
+
+    expires = timedelta(minutes=30)
+    token = create_access_token({"sub": "user"}, expires)
+    embedded_token = create_access_token({"sub": "user", "uid": 1}, expires)
+
+    # Verification alone
+    decode = lambda: auth_utils.jwt.decode(token, auth_utils.SECRET_KEY, algorithms=[auth_utils.ALGORITHM])
+    auth_utils.decode_token(token)
+    print(f"{'token verification':<20} {'us/call':>8}")
+    print(f"{'jose.jwt.decode':<20} {time_per_call(decode, args.repeat):>8.2f}")
+    print(f"{'token cache hit':<20} {time_per_call(lambda: auth_utils.decode_token(token), args.repeat):>8.2f}")
+
+    modes = [
+        ("db lookup", 0, 0, token),
+        ("user cache", 0, auth_utils.USER_CACHE_SIZE, token),
+        ("token cache", auth_utils.TOKEN_CACHE_SIZE, auth_utils.USER_CACHE_SIZE, token),
+        ("embedded id", auth_utils.TOKEN_CACHE_SIZE, auth_utils.USER_CACHE_SIZE, embedded_token),
+    ]
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        await drive(client, "/plain", {}, args.requests, queries)
+        baseline, _ = await drive(client, "/plain", {}, args.requests, queries)
+        print(f"\nno-auth endpoint: {baseline:.1f} us/request (median)\n")
+        # Modes are measured in interleaved rounds (best median kept) so drift over the run does not favour one
+        results = {label: (float("inf"), 0.0) for label, _, _, _ in modes}
+        for _ in range(args.rounds):
+            for label, token_cache_size, user_cache_size, mode_token in modes:
+                # A cache with maxsize 0 stores nothing
+                auth_utils.token_cache.maxsize = token_cache_size
+                auth_utils.user_cache.maxsize = user_cache_size
+                auth_utils.token_cache.clear()
+                auth_utils.user_cache.clear()
+                headers = {"Authorization": f"Bearer {mode_token}"}
+                await drive(client, "/auth", headers, min(args.requests, 100), queries)
+                median, per_request = await drive(client, "/auth", headers, args.requests, queries)
+                results[label] = min(results[label], (median, per_request))
+        print(f"{'mode':<14} {'us/request':>11} {'auth us':>9} {'queries':>8}")
+        for label, (median, per_request) in results.items():
+            print(f"{label:<14} {median:>11.1f} {median - baseline:>9.1f} {per_request:>8.2f}")
+    await async_engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000, help="requests per mode")
+    parser.add_argument("--rounds", type=int, default=3, help="interleaved rounds per mode")
+    parser.add_argument("--repeat", type=int, default=20000, help="calls per verification timing")
+    args = parser.parse_args()
+
+    # The database modules read their settings at import time
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "auth_overhead.db")
+    asyncio.run(benchmark(args))
+
+
+if __name__ == "__main__":
+    main()
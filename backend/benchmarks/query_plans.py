@@ -0,0 +1,155 @@
+"""
+Show the query plans of the hot goal/task queries with and without the
+composite indexes from migrations 0002 and 0003.
+
+Seeds a throwaway database (SQLite by default, or --database-url for a local
+PostgreSQL) and prints the plan of each query twice: once after dropping the
+composite indexes and once with them in place. Every table is dropped before and
+after the run, so a database that already has tables is refused unless --reset
+is given.
+
+Usage (from the backend directory):
+    python -m benchmarks.query_plans [--database-url URL [--reset]] [--users 20] [--goals 20] [--tasks 25]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, inspect, select, func, insert
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+from database import Base
+from models import User, Goal, Task, TaskStatus
+
+COMPOSITE_INDEXES = [
+    index for table in (Goal.__table__, Task.__table__)
+    for index in table.indexes
+    if len(index.columns) > 1
+]
+
+
+class Explain(Executable, ClauseElement):
+    """EXPLAIN wrapper so bind parameters go through the normal type processing."""
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain)
+def _compile_explain(element, compiler, **kw):
+    prefix = "EXPLAIN QUERY PLAN " if compiler.dialect.name == "sqlite" else "EXPLAIN "
+    return prefix + compiler.process(element.statement, **kw)
+
+
+def seed(engine, users: int, goals_per_user: int, tasks_per_goal: int) -> None:
+    now = datetime.utcnow()
+    rng = random.Random(42)
+    statuses = list(TaskStatus)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": u, "email": f"user{u}@example.com", "username": f"user{u}", "hashed_password": "x", "is_active": True}
+            for u in range(1, users + 1)
+        ])
+        goal_rows, task_rows = [], []
+        goal_id = 0
+        for u in range(1, users + 1):
+            for _ in range(goals_per_user):
+                goal_id += 1
+                goal_rows.append({
+                    "id": goal_id, "title": f"Goal {goal_id}", "user_id": u, "priority": "medium",
+                    "created_at": now - timedelta(days=rng.randint(0, 365)),
+                    "deadline": now + timedelta(days=rng.randint(-30, 60)),
+                })
+                for _ in range(tasks_per_goal):
+                    status = rng.choice(statuses)
+                    created = now - timedelta(days=rng.randint(0, 365))
+                    task_rows.append({
+                        "title": "Task", "goal_id": goal_id, "user_id": u, "status": status.name, "priority": "medium",
+                        "created_at": created,
+                        "due_date": created + timedelta(days=rng.randint(1, 60)),
+                        "completed_at": created + timedelta(days=rng.randint(0, 30)) if status == TaskStatus.COMPLETED else None,
+                    })
+        conn.execute(insert(Goal), goal_rows)
+        conn.execute(insert(Task), task_rows)
+
+
+def hot_queries(user_id: int):
+    now = datetime.utcnow()
+    return {
+        "goal list (keyset)": select(Goal).where(Goal.user_id == user_id)
+            .order_by(Goal.created_at, Goal.id).limit(101),
+        "task list (keyset)": select(Task).where(Task.user_id == user_id)
+            .order_by(Task.created_at, Task.id).limit(101),
+        "overdue tasks": select(Task).where(
+            Task.user_id == user_id, Task.due_date < now, Task.status != TaskStatus.COMPLETED
+        ).order_by(Task.due_date, Task.id).limit(101),
+        "completions in range": select(func.count(Task.id)).where(
+            Task.user_id == user_id, Task.completed_at >= now - timedelta(days=30), Task.completed_at < now
+        ),
+        "upcoming deadlines": select(func.count(Goal.id)).where(
+            Goal.user_id == user_id, Goal.deadline >= now, Goal.deadline <= now + timedelta(days=7)
+        ),
+    }
+
+
+def explain(conn, statement):
+    rows = conn.execute(Explain(statement)).all()
+    # SQLite: (id, parent, notused, detail); PostgreSQL: one text column per plan line
+    return [row[-1] for row in rows]
+
+
+def timed(conn, statement, repeat: int = 20) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        conn.execute(statement).all()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def report(engine, label: str, user_id: int) -> None:
+    print(f"\n=== {label} ===")
+    with engine.connect() as conn:
+        for name, statement in hot_queries(user_id).items():
+            print(f"\n-- {name}: {timed(conn, statement):.2f} ms")
+            for line in explain(conn, statement):
+                print(f"   {line}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="defaults to a temporary SQLite file")
+    parser.add_argument("--reset", action="store_true", help="drop the tables of a --database-url that already has some")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--goals", type=int, default=20, help="goals per user")
+    parser.add_argument("--tasks", type=int, default=25, help="tasks per goal")
+    args = parser.parse_args()
+
+    url = args.database_url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "query_plans.db")
+    engine = create_engine(url)
+    existing = inspect(engine).get_table_names()
+    if existing and not args.reset:
+        sys.exit(f"The database already has tables ({', '.join(existing)}); pass --reset to drop them and all their data")
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    seed(engine, args.users, args.goals, args.tasks)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+
+    for index in COMPOSITE_INDEXES:
+        index.drop(engine)
+    report(engine, "without composite indexes", user_id=1)
+
+    for index in COMPOSITE_INDEXES:
+        index.create(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+    report(engine, "with composite indexes", user_id=1)
+
+    Base.metadata.drop_all(engine)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Compare JSON encoders and response compression for a large goal list payload.
+
+Builds a GET /api/goals/-shaped response (GoalResponse with nested tasks) in
+memory and reports, for the standard JSONResponse and ORJSONResponse, the time
+to render it, then the bytes on the wire and CPU cost of each compression
+setting used by CompressionMiddleware.
+
+Usage (from the backend directory):
+    python -m benchmarks.response_encoding [--goals 1000] [--tasks 5] [--repeat 20]
+"""
+import argparse
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import List
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import TypeAdapter
+from schemas import GoalResponse
+from models import TaskStatus
+from compression_utils import GzipCompressor, BrotliCompressor, brotli
+
+
+def build_payload(goals: int, tasks_per_goal: int) -> list:
+    now = datetime.utcnow()
+    statuses = list(TaskStatus)
+    records = []
+    task_id = 0
+    for goal_id in range(1, goals + 1):
+        tasks = []
+        for n in range(tasks_per_goal):
+            task_id += 1
+            tasks.append({
+                "id": task_id, "goal_id": goal_id, "title": f"Task {task_id}",
+                "description": "Read the chapter and summarise the key ideas", "status": statuses[n % 3],
+                "due_date": now + timedelta(days=n), "priority": "medium", "estimated_hours": 1.5,
+                "completed_at": now if statuses[n % 3] == TaskStatus.COMPLETED else None,
+                "created_at": now, "updated_at": now,
+            })
+        completed = sum(1 for task in tasks if task["status"] == TaskStatus.COMPLETED)
+        records.append({
+            "id": goal_id, "user_id": 1, "title": f"Goal {goal_id}", "description": "Learn something new",
+            "deadline": now + timedelta(days=30), "category": "programming", "priority": "high",
+            "total_tasks": len(tasks), "completed_tasks": completed,
+            "progress_percentage": round(completed / len(tasks) * 100, 2) if tasks else 0.0,
+            "created_at": now, "updated_at": now, "tasks": tasks,
+        })
+    adapter = TypeAdapter(List[GoalResponse])
+    # Same JSON-compatible structure FastAPI hands to the response class
+    return adapter.dump_python(adapter.validate_python(records), mode="json")
+
+
+def timed(func, repeat: int):
+    """Median milliseconds per call and the last result."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), result
+
+
+def compress(make_compressor, body: bytes) -> bytes:
+    compressor = make_compressor()
+    return compressor.compress(body) + compressor.finish()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--goals", type=int, default=1000)
+    parser.add_argument("--tasks", type=int, default=5, help="tasks per goal")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    content = build_payload(args.goals, args.tasks)
+    print(f"Payload: {args.goals} goals x {args.tasks} tasks\n")
+
+    print(f"{'response class':<16} {'render ms':>10} {'bytes':>10}")
+    bodies = {}
+    for response_class in (JSONResponse, ORJSONResponse):
+        ms, body = timed(lambda: response_class(content).body, args.repeat)
+        bodies[response_class.__name__] = body
+        print(f"{response_class.__name__:<16} {ms:>10.2f} {len(body):>10}")
+
+    body = bodies["ORJSONResponse"]
+    settings = [(f"gzip {level}", lambda level=level: GzipCompressor(level)) for level in (1, 6, 9)]
+    if brotli is not None:
+        settings += [(f"br {quality}", lambda quality=quality: BrotliCompressor(quality)) for quality in (1, 4, 6)]
+    else:
+        print("\nbrotli is not installed; skipping br")
+
+    print(f"\n{'encoding':<16} {'compress ms':>11} {'bytes':>10} {'ratio':>7}")
+    print(f"{'identity':<16} {0:>11.2f} {len(body):>10} {1:>7.2f}")
+    for label, make_compressor in settings:
+        ms, compressed = timed(lambda: compress(make_compressor, body), args.repeat)
+        print(f"{label:<16} {ms:>11.2f} {len(compressed):>10} {len(body) / len(compressed):>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""
+Caches shared by the API modules.
+
+TTLCache is a small in-process LRU. The async cache backends (MemoryCacheBackend,
+RedisCacheBackend) store byte strings under string keys and back TaggedCache,
+which adds tag-based invalidation, single-flight loading and hit-rate counters.
+"""
+import asyncio
+import itertools
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Sequence
+
+try:
+    import redis.asyncio as redis
+except ImportError:  # redis is optional; only needed for RedisCacheBackend
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after `ttl` seconds.
+
+    Keeps hit/miss counters so cache effectiveness can be inspected.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires_at, value = entry
+                if time.monotonic() < expires_at:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class MemoryCacheBackend:
+    """Per-process backend: entries and tag versions in two bounded LRUs.
+
+    Every tag version comes from one increasing counter, and a tag that is missing
+    (never seen, or evicted) is given a new one. An evicted tag therefore never
+    returns to a version an invalidated entry was stored with.
+    """
+
+    name = "memory"
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0, max_tags: Optional[int] = None):
+        self.entries = TTLCache(maxsize, ttl)
+        self._versions = TTLCache(maxsize if max_tags is None else max_tags, math.inf)
+        self._next_version = itertools.count(1)
+
+    async def get_many(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        return [self._version(key) if key.startswith("tag:") else self.entries.get(key) for key in keys]
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        self.entries.set(key, value, ttl)
+
+    async def incr(self, keys: Sequence[str]) -> None:
+        for key in keys:
+            self._versions.set(key, next(self._next_version))
+
+    def _version(self, key: str) -> int:
+        version = self._versions.get(key)
+        if version is None:
+            version = next(self._next_version)
+            self._versions.set(key, version)
+        return version
+
+    async def close(self) -> None:
+        self.entries.clear()
+
+
+class RedisCacheBackend:
+    """Backend for any server speaking the Redis protocol (Redis, Valkey, KeyDB, ...).
+
+    `client` is a redis.asyncio client, or anything with the same get/set/incr API
+    (e.g. fakeredis.aioredis.FakeRedis).
+    """
+
+    name = "redis"
+
+    def __init__(self, client, prefix: str = "learning_tracker:"):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str, timeout: float = 1.0) -> "RedisCacheBackend":
+        if redis is None:
+            raise RuntimeError("The redis package is required for the redis cache backend")
+        # A slow or unreachable server degrades to uncached reads instead of stalling requests
+        return cls(redis.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout))
+
+    async def get_many(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        values = await self.client.mget([self.prefix + key for key in keys])
+        # Tag versions come back as bytes; callers compare them as ints
+        return [int(value) if value is not None and key.startswith("tag:") else value for key, value in zip(keys, values)]
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await self.client.set(self.prefix + key, value, px=max(1, int(ttl * 1000)))
+
+    async def incr(self, keys: Sequence[str]) -> None:
+        async with self.client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.incr(self.prefix + key)
+            await pipe.execute()
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+class SingleFlight:
+    """Collapses concurrent loads of the same key into one call (per process)."""
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Future] = {}
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._calls
+
+    async def do(self, key: str, load: Callable[[], Awaitable[Any]]) -> Any:
+        while key in self._calls:
+            future = self._calls[key]
+            try:
+                # Shielded so a cancelled waiter does not cancel the shared load
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # The loading caller was cancelled, not this one: the first waiter to get here loads instead
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        try:
+            result = await load()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            # Mark the exception retrieved in case nobody was waiting
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
+
+
+class TaggedCache:
+    """Byte-string cache on a pluggable backend with tag-based invalidation.
+
+    Each tag has a version counter stored in the backend. An entry records the
+    versions of its tags when it was loaded and is only served while they are
+    unchanged, so invalidating a tag is a single increment however many entries
+    carry it. Backend errors are logged and treated as misses.
+    """
+
+    def __init__(self, backend, ttl: float = 60.0, max_entry_size: int = 256 * 1024):
+        self.backend = backend
+        self.ttl = ttl
+        self.max_entry_size = max_entry_size
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.errors = 0
+        self._flight = SingleFlight()
+
+    async def get_or_load(
+        self,
+        key: str,
+        tags: Sequence[str],
+        load: Callable[[], Awaitable[bytes]],
+        ttl: Optional[float] = None
+    ) -> bytes:
+        """Return the cached value of `key`, or call `load` once for all concurrent callers and cache it."""
+        tag_keys = [f"tag:{tag}" for tag in tags]
+        try:
+            values = await self.backend.get_many([key] + tag_keys)
+        except Exception:
+            self.errors += 1
+            logger.warning("Cache backend %s read failed", self.backend.name, exc_info=True)
+            return await load()
+
+        versions = ",".join(str(version or 0) for version in values[1:]).encode()
+        entry = values[0]
+        if entry is not None:
+            entry_versions, _, value = entry.partition(b"\n")
+            if entry_versions == versions:
+                self.hits += 1
+                return value
+
+        # Only loads that saw the same tag versions are shared
+        flight_key = f"{key}@{versions.decode()}"
+        if self._flight.in_flight(flight_key):
+            self.coalesced += 1
+        else:
+            self.misses += 1
+
+        async def load_and_store() -> bytes:
+            value = await load()
+            if len(value) <= self.max_entry_size:
+                try:
+                    # Stored with the tag versions read before loading, so a write that
+                    # lands meanwhile leaves this entry already invalid
+                    await self.backend.set(key, versions + b"\n" + value, self.ttl if ttl is None else ttl)
+                except Exception:
+                    self.errors += 1
+                    logger.warning("Cache backend %s write failed", self.backend.name, exc_info=True)
+            return value
+
+        return await self._flight.do(flight_key, load_and_store)
+
+    async def invalidate(self, *tags: str) -> None:
+        """Invalidate every entry carrying any of `tags`."""
+        try:
+            await self.backend.incr([f"tag:{tag}" for tag in tags])
+        except Exception:
+            self.errors += 1
+            logger.warning("Cache backend %s invalidation failed", self.backend.name, exc_info=True)
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses + self.coalesced
+        return {
+            "backend": self.backend.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            # Coalesced requests were served without their own load, so they count as hits
+            "hit_ratio": round((self.hits + self.coalesced) / total, 4) if total else 0.0,
+        }
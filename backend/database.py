@@ -1,7 +1,17 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, exc, inspect
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
 import os
+import time
+from fastapi import HTTPException, status
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from alembic.script import ScriptDirectory
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -13,21 +23,213 @@ DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./learning_tracker.db")
 if DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
-# Create engine with appropriate settings
+def get_async_database_url(url: str) -> str:
+    """Return the async driver variant of a database URL (asyncpg / aiosqlite)."""
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    return url
+
+ASYNC_DATABASE_URL = get_async_database_url(DATABASE_URL)
+
+# Connection pool of the API engine: persistent connections, extra connections allowed under
+# load, seconds to wait for a free connection, and seconds after which connections are replaced
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+# SQLite: WAL lets readers run alongside a writer; writers wait up to busy_timeout ms for the lock
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000"))
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+
+class PoolStats:
+    """Checkout/wait statistics of the API connection pool, fed by pool events.
+    
+    Wait times cover the whole checkout, including opening a new connection when
+    the pool is below its limit.
+    """
+    
+    def __init__(self):
+        self.pool = None
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.peak_checked_out = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+    
+    @property
+    def checked_out(self) -> int:
+        return self.checkouts - self.checkins
+    
+    def record_wait(self, seconds: float) -> None:
+        self.waits += 1
+        self.wait_seconds += seconds
+        self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+    
+    def attach(self, engine) -> None:
+        self.pool = engine.pool
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+        event.listen(engine, "invalidate", self._on_invalidate)
+    
+    def _on_connect(self, dbapi_connection, connection_record):
+        self.connects += 1
+    
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        self.checkouts += 1
+        self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+    
+    def _on_checkin(self, dbapi_connection, connection_record):
+        self.checkins += 1
+    
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        self.invalidations += 1
+    
+    def snapshot(self) -> Dict[str, Any]:
+        stats = {
+            "pool": type(self.pool).__name__ if self.pool is not None else None,
+            "checked_out": self.checked_out,
+            "peak_checked_out": self.peak_checked_out,
+            "connects": self.connects,
+            "checkouts": self.checkouts,
+            "invalidations": self.invalidations,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": round(self.wait_seconds / self.waits * 1000, 3) if self.waits else 0.0,
+            "max_wait_ms": round(self.max_wait_seconds * 1000, 3),
+        }
+        if isinstance(self.pool, AsyncAdaptedQueuePool):
+            stats.update(size=self.pool.size(), overflow=self.pool.overflow(), idle=self.pool.checkedin())
+        return stats
+
+pool_stats = PoolStats()
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waits (there is no pool event for that)."""
+    
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            pool_stats.timeouts += 1
+            raise
+        finally:
+            pool_stats.record_wait(time.perf_counter() - start)
+
+def pool_options() -> Dict[str, Any]:
+    return {
+        "poolclass": InstrumentedPool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+    }
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.close()
+
+# Create engines with appropriate settings. The async engine serves API requests;
+# the sync engine is kept for scripts and maintenance commands.
 if DATABASE_URL.startswith("sqlite"):
     engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+    # An in-memory database lives in a single connection, so it keeps the default pool
+    in_memory = DATABASE_URL in ("sqlite://", "sqlite:///:memory:")
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, **({} if in_memory else pool_options()))
+    if not in_memory:
+        event.listen(engine, "connect", set_sqlite_pragmas)
+        event.listen(async_engine.sync_engine, "connect", set_sqlite_pragmas)
 else:
     # PostgreSQL settings
     engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, pool_pre_ping=True, **pool_options())
+
+pool_stats.attach(async_engine.sync_engine)
+
+class QueryStats:
+    """Statements executed on behalf of one request: count, total time and the slowest one."""
+    
+    def __init__(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest_statement: Optional[str] = None
+    
+    def record(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.total_seconds += seconds
+        if seconds >= self.slowest_seconds:
+            self.slowest_seconds = seconds
+            self.slowest_statement = statement
+
+# Set per request by query_timing_utils.QueryTimingMiddleware; None outside requests
+current_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("current_query_stats", default=None)
+
+@event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+@event.listens_for(async_engine.sync_engine, "after_cursor_execute")
+def _record_query_time(conn, cursor, statement, parameters, context, executemany):
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.record(statement, time.perf_counter() - context._query_started)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# expire_on_commit=False: attributes cannot be lazily reloaded after commit in async code
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
+ALEMBIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic")
+
+def create_schema_if_empty(connection) -> bool:
+    """Create the current schema on an empty database and stamp it as migrated to head.
+    
+    Databases that already have tables are left to `alembic upgrade head`: creating their
+    missing tables here would make the migrations that add those tables fail.
+    """
+    if inspect(connection).get_table_names():
+        return False
+    Base.metadata.create_all(connection)
+    config = Config()
+    config.set_main_option("script_location", ALEMBIC_DIR)
+    MigrationContext.configure(connection).stamp(ScriptDirectory.from_config(config), "head")
+    return True
+
 # Dependency to get database session
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close() 
\ No newline at end of file
+
+async def commit_or_conflict(db: AsyncSession, detail: str, *refresh) -> None:
+    """Commit, answering 409 Conflict when a versioned row changed since it was read.
+    
+    Instances in `refresh` are reloaded before the commit, inside the same transaction,
+    so they show this write even if another request changes or deletes the rows right after.
+    """
+    try:
+        if refresh:
+            await db.flush()
+            for instance in refresh:
+                try:
+                    await db.refresh(instance)
+                except exc.InvalidRequestError:
+                    # Deleted by another request (a write that changed nothing has no version check)
+                    raise StaleDataError(f"{instance!r} no longer exists")
+        await db.commit()
+    except StaleDataError:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=detail)
@@ -0,0 +1,62 @@
+"""
+Conditional GET (ETag / If-None-Match) support for per-user read endpoints.
+
+Every write to a user's goals or tasks bumps users.data_version in the same
+transaction, so an ETag derived from that version and the request URL changes
+exactly when the response could. Checking it is a single primary-key lookup;
+on a match the request is answered with 304 before the endpoint runs.
+"""
+import hashlib
+import time
+from typing import Optional
+from fastapi import Depends, HTTPException, Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_db
+from models import User
+from auth_utils import get_current_identity, UserIdentity
+
+# Clients must revalidate on every use; the ETag makes that cheap
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(user_id: int, data_version: int, request: Request, window: Optional[int] = None) -> str:
+    parts = [user_id, data_version, request.url.path, request.url.query]
+    if window:
+        # Time-dependent responses (overdue, upcoming, progress) also change as time passes
+        parts.append(int(time.time() // window))
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as required for If-None-Match
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag.removeprefix("W/") in tags
+
+
+def conditional_get(window: Optional[int] = None):
+    """Dependency answering 304 Not Modified when If-None-Match matches the current ETag.
+    
+    `window` (seconds) additionally expires the ETag for responses that depend on the clock.
+    Returns the user's data version, for endpoints that cache derived data per version.
+    """
+    async def check(
+        request: Request,
+        response: Response,
+        current_user: UserIdentity = Depends(get_current_identity),
+        db: AsyncSession = Depends(get_db)
+    ):
+        data_version = await db.scalar(select(User.data_version).where(User.id == current_user.id))
+        etag = make_etag(current_user.id, data_version, request, window)
+        headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+        if etag_matches(etag, request.headers.get("if-none-match")):
+            raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        response.headers.update(headers)
+        return data_version
+    
+    return check
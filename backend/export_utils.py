@@ -0,0 +1,122 @@
+"""
+Record format shared by the export and import endpoints.
+
+Goals and tasks are written as flat records tagged with a `type` field
+("goal" or "task"), either one JSON object per line (NDJSON) or as CSV rows
+with a fixed column set; fields that do not apply to a record type are empty.
+"""
+import codecs
+import csv
+import enum
+import io
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, List, Tuple
+from models import Goal, Task
+
+GOAL_FIELDS = ["id", "title", "description", "deadline", "category", "priority", "created_at", "updated_at"]
+TASK_FIELDS = [
+    "id", "goal_id", "title", "description", "status", "due_date", "completed_at",
+    "priority", "estimated_hours", "created_at", "updated_at",
+]
+CSV_COLUMNS = ["type"] + list(dict.fromkeys(GOAL_FIELDS + TASK_FIELDS))
+
+GOAL_COLUMNS = [getattr(Goal, field) for field in GOAL_FIELDS]
+TASK_COLUMNS = [getattr(Task, field) for field in TASK_FIELDS]
+
+
+class ExportFormat(str, enum.Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+MEDIA_TYPES = {
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.CSV: "text/csv",
+}
+
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    return value
+
+
+def to_record(record_type: str, fields: List[str], row) -> Dict[str, Any]:
+    """Turn a result row into an export record."""
+    record = {"type": record_type}
+    record.update((field, _plain(value)) for field, value in zip(fields, row))
+    return record
+
+
+def format_ndjson(records: Iterable[Dict[str, Any]]) -> str:
+    return "".join(json.dumps(record) + "\n" for record in records)
+
+
+def format_csv(records: Iterable[Dict[str, Any]], header: bool = False) -> str:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, extrasaction="ignore")
+    if header:
+        writer.writeheader()
+    writer.writerows(records)
+    return buffer.getvalue()
+
+
+class RecordError(ValueError):
+    """A row the import parsers could not turn into a record; yielded in place of the record."""
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a stream of UTF-8 byte chunks into lines without buffering the whole stream."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+async def iter_ndjson_records(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, Any]]:
+    """Yield (line number, record) pairs; unparsable lines yield a RecordError instead."""
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as exc:
+            yield line_number, RecordError(f"Invalid JSON: {exc}")
+
+
+async def iter_csv_records(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, Any]]:
+    """Yield (row number, record) pairs from CSV text with a header row.
+
+    Quoted fields may span lines: physical lines are joined until the quotes balance.
+    Empty cells become None. A quote left open at the end of the input yields a RecordError.
+    """
+    header = None
+    buffer: List[str] = []
+    row_number = 0
+    async for line in lines:
+        buffer.append(line)
+        text = "\n".join(buffer)
+        if text.count('"') % 2:
+            continue
+        buffer = []
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = values
+            continue
+        row_number += 1
+        yield row_number, {key: (value if value != "" else None) for key, value in zip(header, values)}
+    if buffer:
+        yield row_number + 1, RecordError("Unterminated quoted field at end of input")
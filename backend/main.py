@@ -1,11 +1,19 @@
 from fastapi import FastAPI, HTTPException, Depends, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from contextlib import asynccontextmanager
 import uvicorn
-from database import engine, Base, get_db
-from routers import auth, goals, tasks, dashboard
-from auth_utils import verify_token, get_current_user
+from database import async_engine, get_db, pool_stats, create_schema_if_empty
+from routers import auth, goals, tasks, dashboard, export, imports, admin
+from auth_utils import verify_token, get_current_user, password_pool
+from pagination_utils import NEXT_CURSOR_HEADER
+from compression_utils import CompressionMiddleware
+from query_timing_utils import QueryTimingMiddleware
+from profiling_utils import ProfilingMiddleware, PROFILER_ENABLED, profiler
+from metrics_utils import MetricsMiddleware, collect_metrics, start_metrics_export, stop_metrics_export, CONTENT_TYPE
+from scheduler_utils import start_scheduler, stop_scheduler
+from response_cache_utils import response_cache
 import os
 from dotenv import load_dotenv
 
@@ -14,16 +22,29 @@ load_dotenv()
 # Create database tables
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Create tables on startup
-    Base.metadata.create_all(bind=engine)
+    # Create and stamp the schema on a fresh database; existing ones are migrated with Alembic
+    async with async_engine.begin() as conn:
+        await conn.run_sync(create_schema_if_empty)
+    # Precompute periodic aggregates in the background
+    scheduler = start_scheduler()
+    # Share this worker's metrics with the others through METRICS_DIR
+    metrics_export = start_metrics_export()
     yield
     # Clean up resources on shutdown
+    await stop_metrics_export(metrics_export)
+    await profiler.stop()
+    await stop_scheduler(scheduler)
+    await async_engine.dispose()
+    password_pool.shutdown()
+    if response_cache is not None:
+        await response_cache.close()
 
 app = FastAPI(
     title="Personal Learning Tracker API",
     description="A comprehensive API for tracking personal learning goals and tasks",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS
@@ -33,8 +54,23 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
+# Compress large responses (brotli or gzip, see COMPRESSION_* settings)
+app.add_middleware(CompressionMiddleware)
+
+# Request counts, latency histograms and in-flight gauges per route for GET /metrics
+# (added before QueryTimingMiddleware so it runs inside it and sees the request's query stats)
+app.add_middleware(MetricsMiddleware)
+
+# Opt-in sampling profiler, driven from the /api/admin/profiler endpoints
+if PROFILER_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
+# Per-request query count and DB time: Server-Timing header, log line, QUERY_BUDGET warnings
+app.add_middleware(QueryTimingMiddleware)
+
 # Security scheme
 security = HTTPBearer()
 
@@ -43,6 +79,10 @@ app.include_router(auth.router, prefix="/api/auth", tags=["authentication"])
 app.include_router(goals.router, prefix="/api/goals", tags=["goals"])
 app.include_router(tasks.router, prefix="/api/tasks", tags=["tasks"])
 app.include_router(dashboard.router, prefix="/api/dashboard", tags=["dashboard"])
+app.include_router(export.router, prefix="/api/export", tags=["export"])
+app.include_router(imports.router, prefix="/api/import", tags=["import"])
+if PROFILER_ENABLED:
+    app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
 
 @app.get("/")
 async def root():
@@ -52,5 +92,15 @@ async def root():
 async def health_check():
     return {"status": "healthy", "message": "API is running smoothly"}
 
+@app.get("/health/pool")
+async def pool_health():
+    """Live connection pool usage and checkout wait times, for sizing workers against the database."""
+    return pool_stats.snapshot()
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """Prometheus metrics: request latency per route, connection and bcrypt pools, cache hit ratios."""
+    return PlainTextResponse(collect_metrics(), media_type=CONTENT_TYPE)
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
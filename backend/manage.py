@@ -0,0 +1,39 @@
+"""
+Maintenance commands for the Personal Learning Tracker database.
+
+Usage (from the backend directory):
+    python manage.py repair-counters
+    python manage.py rebuild-progress
+"""
+import argparse
+from database import engine
+from models import recompute_goal_counters, rebuild_daily_progress
+
+
+def repair_counters(args):
+    """Recompute goals.total_tasks / goals.completed_tasks from the tasks table."""
+    with engine.begin() as connection:
+        updated = recompute_goal_counters(connection)
+    print(f"Recomputed task counters for {updated} goals")
+
+
+def rebuild_progress(args):
+    """Regenerate the daily_progress rollup from the tasks table."""
+    with engine.begin() as connection:
+        written = rebuild_daily_progress(connection)
+    print(f"Rebuilt daily progress: {written} user-day rows")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Personal Learning Tracker maintenance commands")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    subcommands.add_parser("repair-counters", help=repair_counters.__doc__).set_defaults(func=repair_counters)
+    subcommands.add_parser("rebuild-progress", help=rebuild_progress.__doc__).set_defaults(func=rebuild_progress)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
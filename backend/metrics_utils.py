@@ -0,0 +1,425 @@
+"""
+Prometheus metrics for GET /metrics.
+
+A small in-process registry: counters and histograms are plain dicts updated
+on the event loop (no locks, no per-sample allocation beyond the label tuple),
+and gauges such as pool usage are read from their sources when collected.
+MetricsMiddleware records request counts, latency histograms per route
+template, requests in flight and per-route query counts (from the
+QueryTimingMiddleware stats).
+
+With several workers, set METRICS_DIR to a directory they share: every worker
+writes a snapshot there each METRICS_EXPORT_INTERVAL seconds, and /metrics
+sums the snapshots of all running workers, so any worker can answer a scrape.
+As in prometheus_client's multiprocess mode, the counters and histograms of
+workers that have exited are folded into an aggregate file and keep counting
+towards the totals, which therefore never go backwards; only their gauges are
+dropped. Without METRICS_DIR only the answering worker is reported.
+"""
+import asyncio
+import bisect
+import fcntl
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from database import current_query_stats, pool_stats
+from auth_utils import password_pool, user_cache, token_cache
+from stats_utils import dashboard_stats
+from response_cache_utils import response_cache
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+METRICS_DIR = os.getenv("METRICS_DIR", "")
+METRICS_EXPORT_INTERVAL = float(os.getenv("METRICS_EXPORT_INTERVAL", "5"))
+# Counter and histogram totals of the workers that have exited
+AGGREGATE_FILE = "aggregate.json"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Starlette appends the charset
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+class Metric:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[Tuple[str, ...], object] = {}
+
+    def set(self, labels: Tuple[str, ...], value: float) -> None:
+        self.values[labels] = value
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, labels: Tuple[str, ...] = (), amount: float = 1.0) -> None:
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def inc(self, labels: Tuple[str, ...] = (), amount: float = 1.0) -> None:
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        # Per label set: one count per bucket (non-cumulative, +Inf last), then sum
+        state = self.values.get(labels)
+        if state is None:
+            state = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        state[bisect.bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+        self.collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def collector(self, func: Callable[[], None]) -> Callable[[], None]:
+        """Register a function that refreshes gauges from their source before each snapshot."""
+        self.collectors.append(func)
+        return func
+
+    def snapshot(self) -> Dict:
+        """JSON-serializable state of every metric, after running the collectors."""
+        for collect in self.collectors:
+            try:
+                collect()
+            except Exception:
+                logger.warning("Metrics collector %s failed", collect.__name__, exc_info=True)
+        return {
+            name: {
+                "type": metric.type,
+                "help": metric.documentation,
+                "labelnames": list(metric.labelnames),
+                "buckets": list(getattr(metric, "buckets", ())),
+                "samples": [[list(labels), value] for labels, value in metric.values.items()],
+            }
+            for name, metric in self.metrics.items()
+        }
+
+
+def merge_snapshots(snapshots: Iterable[Dict]) -> Dict:
+    """Sum snapshots from several workers, sample by sample."""
+    merged: Dict = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.setdefault(name, {**metric, "samples": {}})
+            for labels, value in metric["samples"]:
+                key = tuple(labels)
+                current = target["samples"].get(key)
+                if current is None:
+                    target["samples"][key] = list(value) if isinstance(value, list) else value
+                elif isinstance(value, list):
+                    target["samples"][key] = [a + b for a, b in zip(current, value)]
+                else:
+                    target["samples"][key] = current + value
+    return merged
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def render(merged: Dict) -> str:
+    """Prometheus text exposition format of merged snapshots."""
+    lines = []
+    for name, metric in merged.items():
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        labelnames = metric["labelnames"]
+        for labels, value in metric["samples"].items():
+            if metric["type"] != "histogram":
+                lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_value(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(metric["buckets"] + ["+Inf"], value[:-1]):
+                cumulative += count
+                le = bound if bound == "+Inf" else _format_value(bound)
+                lines.append(f"{name}_bucket{_format_labels(labelnames, labels, ('le', le))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labelnames, labels)} {_format_value(value[-1])}")
+            lines.append(f"{name}_count{_format_labels(labelnames, labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_requests = registry.counter("http_requests_total", "HTTP requests by route template and status", ("method", "route", "status"))
+http_latency = registry.histogram("http_request_duration_seconds", "HTTP request latency", ("method", "route"))
+http_in_flight = registry.gauge("http_requests_in_flight", "HTTP requests being served", ("method",))
+http_db_queries = registry.counter("http_request_db_queries_total", "SQL statements run by requests", ("method", "route"))
+http_db_seconds = registry.counter("http_request_db_seconds_total", "Time requests spent in SQL statements", ("method", "route"))
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_in_flight.inc((method,))
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_in_flight.inc((method,), -1)
+            # The route template keeps label cardinality bounded (ids are not labels)
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            http_requests.inc((method, path, str(status)))
+            http_latency.observe((method, path), time.perf_counter() - start)
+            stats = current_query_stats.get()
+            if stats is not None and stats.count:
+                http_db_queries.inc((method, path), stats.count)
+                http_db_seconds.inc((method, path), stats.total_seconds)
+
+
+db_pool_connections = registry.gauge("db_pool_connections", "Database connections by state", ("state",))
+db_pool_checkouts = registry.counter("db_pool_checkouts_total", "Connection checkouts from the pool")
+db_pool_timeouts = registry.counter("db_pool_timeouts_total", "Checkouts that gave up after DB_POOL_TIMEOUT")
+db_pool_wait_seconds = registry.counter("db_pool_wait_seconds_total", "Time spent waiting for a pooled connection")
+db_pool_waits = registry.counter("db_pool_waits_total", "Timed connection checkouts")
+password_hash_in_flight = registry.gauge("password_hash_in_flight", "bcrypt calls running or queued")
+password_hash_queue_depth = registry.gauge("password_hash_queue_depth", "bcrypt calls waiting for a worker thread")
+password_hash_rejected = registry.counter("password_hash_rejected_total", "bcrypt calls refused with 503 because the queue was full")
+cache_hits = registry.counter("cache_hits_total", "Cache lookups served from the cache", ("cache",))
+cache_misses = registry.counter("cache_misses_total", "Cache lookups that had to load", ("cache",))
+cache_entries = registry.gauge("cache_entries", "Entries held by in-process caches", ("cache",))
+
+
+@registry.collector
+def collect_pool() -> None:
+    snapshot = pool_stats.snapshot()
+    db_pool_connections.set(("checked_out",), snapshot["checked_out"])
+    if "size" in snapshot:
+        db_pool_connections.set(("idle",), snapshot["idle"])
+        db_pool_connections.set(("size",), snapshot["size"])
+        # QueuePool reports overflow as negative until the pool has opened `size` connections
+        db_pool_connections.set(("overflow",), max(0, snapshot["overflow"]))
+    db_pool_checkouts.set((), pool_stats.checkouts)
+    db_pool_timeouts.set((), pool_stats.timeouts)
+    db_pool_wait_seconds.set((), pool_stats.wait_seconds)
+    db_pool_waits.set((), pool_stats.waits)
+
+
+@registry.collector
+def collect_password_pool() -> None:
+    password_hash_in_flight.set((), password_pool.in_flight)
+    password_hash_queue_depth.set((), password_pool.queue_depth)
+    password_hash_rejected.set((), password_pool.rejected)
+
+
+@registry.collector
+def collect_caches() -> None:
+    caches = {"user": user_cache.stats(), "token": token_cache.stats(), "dashboard_stats": dashboard_stats.stats()}
+    if response_cache is not None:
+        response = response_cache.stats()
+        # Coalesced loads waited for another request's load instead of running their own
+        caches["response"] = {"hits": response["hits"] + response["coalesced"], "misses": response["misses"]}
+    for name, stats in caches.items():
+        cache_hits.set((name,), stats["hits"])
+        cache_misses.set((name,), stats["misses"])
+        if "size" in stats:
+            cache_entries.set((name,), stats["size"])
+
+
+def worker_snapshot_path(pid: Optional[int] = None) -> str:
+    # Looked up per call: workers forked from a preloading master share module state but not pids
+    return os.path.join(METRICS_DIR, f"worker-{os.getpid() if pid is None else pid}.json")
+
+
+def _write_json(path: str, data: Dict) -> None:
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as f:
+        json.dump(data, f)
+    # Readers never see a partially written file
+    os.replace(temporary, path)
+
+
+def _read_json(path: str) -> Optional[Dict]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_snapshot() -> None:
+    _write_json(worker_snapshot_path(), registry.snapshot())
+
+
+@contextmanager
+def metrics_dir_lock(exclusive: bool):
+    """Lock METRICS_DIR: folding a snapshot into the aggregate is exclusive, reading is shared."""
+    with open(os.path.join(METRICS_DIR, ".lock"), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield
+
+
+def _pid_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _snapshot_pid(name: str) -> Optional[int]:
+    if not (name.startswith("worker-") and name.endswith(".json")):
+        return None
+    pid = name[len("worker-"):-len(".json")]
+    return int(pid) if pid.isdigit() else None
+
+
+def fold_into_aggregate(path: str) -> None:
+    """Add a worker snapshot's counters and histograms to the aggregate and remove it; hold the exclusive lock."""
+    snapshot = _read_json(path)
+    if snapshot is not None:
+        aggregate_path = os.path.join(METRICS_DIR, AGGREGATE_FILE)
+        totals = {name: metric for name, metric in snapshot.items() if metric["type"] != "gauge"}
+        merged = merge_snapshots([_read_json(aggregate_path) or {}, totals])
+        _write_json(aggregate_path, {
+            name: {**metric, "samples": [[list(labels), value] for labels, value in metric["samples"].items()]}
+            for name, metric in merged.items()
+        })
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def read_worker_snapshots(exclude: str) -> List[Dict]:
+    """Snapshots of the other running workers, plus the aggregate of the exited ones."""
+    exited = []
+    for entry in os.scandir(METRICS_DIR):
+        pid = _snapshot_pid(entry.name)
+        if pid is not None and not _pid_running(pid):
+            exited.append(entry.path)
+    if exited:
+        # Workers that died without folding their own snapshot
+        with metrics_dir_lock(exclusive=True):
+            for path in exited:
+                fold_into_aggregate(path)
+    snapshots = []
+    with metrics_dir_lock(exclusive=False):
+        for entry in os.scandir(METRICS_DIR):
+            if entry.path == exclude or (entry.name != AGGREGATE_FILE and _snapshot_pid(entry.name) is None):
+                continue
+            snapshot = _read_json(entry.path)
+            if snapshot is not None:
+                snapshots.append(snapshot)
+    return snapshots
+
+
+def add_hit_ratios(merged: Dict) -> None:
+    """Derive cache_hit_ratio from the summed hit and miss counters (ratios themselves do not add up)."""
+    hits = merged.get("cache_hits_total", {}).get("samples", {})
+    misses = merged.get("cache_misses_total", {}).get("samples", {})
+    ratios = {}
+    for labels in sorted(hits.keys() | misses.keys()):
+        total = hits.get(labels, 0) + misses.get(labels, 0)
+        ratios[labels] = round(hits.get(labels, 0) / total, 4) if total else 0.0
+    merged["cache_hit_ratio"] = {
+        "type": "gauge", "help": "Share of cache lookups served from the cache", "labelnames": ["cache"],
+        "buckets": [], "samples": ratios,
+    }
+
+
+def collect_metrics() -> str:
+    """Render this worker's metrics, summed with the other workers' snapshots if METRICS_DIR is set."""
+    snapshots = [registry.snapshot()]
+    if METRICS_DIR:
+        snapshots += read_worker_snapshots(exclude=worker_snapshot_path())
+    merged = merge_snapshots(snapshots)
+    add_hit_ratios(merged)
+    return render(merged)
+
+
+async def export_snapshots() -> None:
+    """Background task writing this worker's snapshot to METRICS_DIR until cancelled, then folding it into the aggregate."""
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    with metrics_dir_lock(exclusive=True):
+        # Left behind by an earlier worker with this pid
+        fold_into_aggregate(worker_snapshot_path())
+    try:
+        while True:
+            try:
+                write_snapshot()
+            except OSError:
+                logger.warning("Could not write metrics snapshot to %s", METRICS_DIR, exc_info=True)
+            await asyncio.sleep(METRICS_EXPORT_INTERVAL)
+    finally:
+        try:
+            with metrics_dir_lock(exclusive=True):
+                write_snapshot()
+                fold_into_aggregate(worker_snapshot_path())
+        except OSError:
+            logger.warning("Could not fold metrics snapshot into %s", METRICS_DIR, exc_info=True)
+
+
+def start_metrics_export() -> Optional[asyncio.Task]:
+    if not METRICS_DIR:
+        return None
+    return asyncio.create_task(export_snapshots())
+
+
+async def stop_metrics_export(task: Optional[asyncio.Task]) -> None:
+    if task is None:
+        return
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
@@ -1,5 +1,7 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, Enum
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Boolean, Date, DateTime, Text, ForeignKey, Enum, Index, TypeDecorator, select, insert, update, delete, func, event, inspect, literal, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import relationship, selectinload, Session
+from collections import defaultdict
 from datetime import datetime, timezone
 import enum
 from database import Base
@@ -9,6 +11,26 @@ class TaskStatus(enum.Enum):
     IN_PROGRESS = "in_progress"
     COMPLETED = "completed"
 
+class UTCDateTime(TypeDecorator):
+    """Naive UTC timestamp column that also accepts timezone-aware datetimes.
+    
+    asyncpg refuses aware datetimes for TIMESTAMP WITHOUT TIME ZONE columns, so
+    aware values are converted to UTC and stored without tzinfo.
+    """
+    impl = DateTime
+    cache_ok = True
+    
+    def process_bind_param(self, value, dialect):
+        if value is not None and value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+def progress_percentage(completed_tasks, total_tasks):
+    """Share of completed tasks as a percentage rounded to 2 decimals (0 for goals without tasks)."""
+    if not total_tasks:
+        return 0
+    return round((completed_tasks / total_tasks) * 100, 2)
+
 class User(Base):
     __tablename__ = "users"
     
@@ -19,23 +41,35 @@ class User(Base):
     first_name = Column(String, nullable=True)
     last_name = Column(String, nullable=True)
     is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime, default=datetime.now(timezone.utc))
-    updated_at = Column(DateTime, default=datetime.now(timezone.utc), onupdate=datetime.now(timezone.utc))
+    created_at = Column(UTCDateTime, default=datetime.now(timezone.utc))
+    updated_at = Column(UTCDateTime, default=datetime.now(timezone.utc), onupdate=datetime.now(timezone.utc))
+    # Bumped on every write to the user's goals or tasks; used for ETags
+    data_version = Column(Integer, nullable=False, default=0, server_default="0")
     
     # Relationships
     goals = relationship("Goal", back_populates="user", cascade="all, delete-orphan")
 
 class Goal(Base):
     __tablename__ = "goals"
+    __table_args__ = (
+        # Per-user listings ordered by creation (keyset pagination, recent goals)
+        Index("ix_goals_user_id_created_at", "user_id", "created_at", "id"),
+        # Upcoming deadline counts
+        Index("ix_goals_user_id_deadline", "user_id", "deadline"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
     description = Column(Text, nullable=True)
-    deadline = Column(DateTime, nullable=True)
+    deadline = Column(UTCDateTime, nullable=True)
     category = Column(String, nullable=True)
     priority = Column(String, default="medium")  # low, medium, high
-    created_at = Column(DateTime, default=datetime.now(timezone.utc))
-    updated_at = Column(DateTime, default=datetime.now(timezone.utc), onupdate=datetime.now(timezone.utc))
+    created_at = Column(UTCDateTime, default=datetime.now(timezone.utc))
+    updated_at = Column(UTCDateTime, default=datetime.now(timezone.utc), onupdate=datetime.now(timezone.utc))
+    
+    # Task counters, maintained by the Task flush hooks below
+    total_tasks = Column(Integer, nullable=False, default=0, server_default="0")
+    completed_tasks = Column(Integer, nullable=False, default=0, server_default="0")
     
     # Foreign key
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -47,41 +81,44 @@ class Goal(Base):
     @property
     def progress_percentage(self):
         """Calculate progress percentage based on completed tasks"""
-        if not self.tasks:
-            return 0
-        completed_tasks = sum(1 for task in self.tasks if task.status == TaskStatus.COMPLETED)
-        return round((completed_tasks / len(self.tasks)) * 100, 2)
-    
-    @property
-    def total_tasks(self):
-        """Get total number of tasks"""
-        return len(self.tasks)
-    
-    @property
-    def completed_tasks(self):
-        """Get number of completed tasks"""
-        return sum(1 for task in self.tasks if task.status == TaskStatus.COMPLETED)
+        return progress_percentage(self.completed_tasks, self.total_tasks)
 
 class Task(Base):
     __tablename__ = "tasks"
+    __table_args__ = (
+        # Per-goal task loading and completed counts
+        Index("ix_tasks_goal_id_status", "goal_id", "status"),
+        # User-scoped task scans filter on the denormalized owner column
+        Index("ix_tasks_user_id_status", "user_id", "status"),
+        Index("ix_tasks_user_id_due_date", "user_id", "due_date", "id"),
+        Index("ix_tasks_user_id_completed_at", "user_id", "completed_at"),
+        Index("ix_tasks_user_id_created_at", "user_id", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
     description = Column(Text, nullable=True)
     status = Column(Enum(TaskStatus), default=TaskStatus.NOT_STARTED)
-    due_date = Column(DateTime, nullable=True)
-    completed_at = Column(DateTime, nullable=True)
+    due_date = Column(UTCDateTime, nullable=True)
+    completed_at = Column(UTCDateTime, nullable=True)
     priority = Column(String, default="medium")  # low, medium, high
     estimated_hours = Column(Integer, nullable=True)
-    created_at = Column(DateTime, default=datetime.now(timezone.utc))
-    updated_at = Column(DateTime, default=datetime.now(timezone.utc), onupdate=datetime.now(timezone.utc))
+    created_at = Column(UTCDateTime, default=datetime.now(timezone.utc))
+    updated_at = Column(UTCDateTime, default=datetime.now(timezone.utc), onupdate=datetime.now(timezone.utc))
+    # Incremented by every UPDATE; flushes match on it (StaleDataError otherwise), so two requests
+    # that read the same task cannot both apply their goal counter and rollup deltas
+    version = Column(Integer, nullable=False, default=0, server_default="0")
     
-    # Foreign key
+    # Foreign keys
     goal_id = Column(Integer, ForeignKey("goals.id"), nullable=False)
+    # Owner of the goal, denormalized so ownership checks don't need a join
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     
     # Relationships
     goal = relationship("Goal", back_populates="tasks")
     
+    __mapper_args__ = {"version_id_col": version}
+    
     def mark_completed(self):
         """Mark task as completed and set completion timestamp"""
         self.status = TaskStatus.COMPLETED
@@ -95,4 +132,309 @@ class Task(Base):
     def mark_not_started(self):
         """Mark task as not started"""
         self.status = TaskStatus.NOT_STARTED
-        self.completed_at = None 
\ No newline at end of file
+        self.completed_at = None
+
+class DailyProgress(Base):
+    """Per-user, per-day (UTC) counts of tasks created and completed, read by the progress endpoint.
+    
+    Maintained incrementally by the Task flush hooks below; rebuild with
+    `python manage.py rebuild-progress`.
+    """
+    __tablename__ = "daily_progress"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    created_tasks = Column(Integer, nullable=False, default=0, server_default="0")
+    completed_tasks = Column(Integer, nullable=False, default=0, server_default="0")
+
+class UserStatsSnapshot(Base):
+    """Dashboard aggregates precomputed per user by the background scheduler.
+    
+    `data_version` is the user's data version when the row was computed; readers
+    only trust a snapshot while it still matches users.data_version.
+    """
+    __tablename__ = "user_stats_snapshots"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    overdue_tasks = Column(Integer, nullable=False, default=0)
+    upcoming_deadlines = Column(Integer, nullable=False, default=0)
+    current_streak = Column(Integer, nullable=False, default=0)
+    longest_streak = Column(Integer, nullable=False, default=0)
+    data_version = Column(Integer, nullable=False, default=0)
+    computed_at = Column(UTCDateTime, nullable=False)
+
+class SchedulerLock(Base):
+    """Lease held by the worker that runs a scheduled job; expires unless renewed."""
+    __tablename__ = "scheduler_locks"
+    
+    name = Column(String, primary_key=True)
+    owner = Column(String, nullable=False)
+    expires_at = Column(UTCDateTime, nullable=False)
+
+@event.listens_for(Task, "before_insert")
+@event.listens_for(Task, "before_update")
+def _sync_task_owner(mapper, connection, target):
+    """Keep Task.user_id equal to the owner of the task's goal.
+    
+    Handlers set user_id themselves; this only looks the owner up when it is
+    missing or the task moved to another goal without updating it.
+    """
+    attrs = inspect(target).attrs
+    goal_changed = bool(attrs.goal_id.history.deleted) and not attrs.user_id.history.added
+    if target.user_id is None or goal_changed:
+        target.user_id = connection.scalar(select(Goal.user_id).where(Goal.id == target.goal_id))
+
+@event.listens_for(Goal, "after_update")
+def _propagate_goal_owner(mapper, connection, target):
+    """Move a goal's tasks, and their daily_progress counts, along when the goal changes owner."""
+    if not inspect(target).attrs.user_id.history.has_changes():
+        return
+    # The tasks' denormalized owner is the before-image (the goal's previous owner may never have been loaded)
+    moved = connection.execute(select(Task.id, Task.user_id, Task.created_at, Task.completed_at).where(
+        Task.goal_id == target.id,
+        Task.user_id != target.user_id
+    ).with_for_update()).all()
+    if not moved:
+        return
+    # Bumping the versions makes concurrent writes of these tasks fail instead of rolling up under the old owner
+    connection.execute(update(Task).where(Task.id.in_([row.id for row in moved])).values(
+        user_id=target.user_id,
+        version=Task.version + 1
+    ))
+    _apply_daily_progress(connection, [
+        ((row.user_id, row.created_at, row.completed_at), (target.user_id, row.created_at, row.completed_at))
+        for row in moved
+    ])
+    connection.execute(data_version_bump({row.user_id for row in moved}))
+
+def goal_counters_delta(goal_id, total=0, completed=0):
+    """UPDATE statement adding `total`/`completed` to a goal's stored task counters."""
+    return update(Goal).where(Goal.id == goal_id).values(
+        total_tasks=Goal.total_tasks + total,
+        completed_tasks=Goal.completed_tasks + completed,
+        # Counter maintenance is not a user edit of the goal
+        updated_at=Goal.updated_at
+    )
+
+def _adjust_goal_counters(connection, goal_id, total=0, completed=0):
+    if goal_id is None or (total == 0 and completed == 0):
+        return
+    connection.execute(goal_counters_delta(goal_id, total, completed))
+
+def recompute_goal_counters(connection, goal_ids=None):
+    """Recompute stored task counters from the tasks table in one UPDATE.
+    
+    Updates every goal, or only `goal_ids` when given. Returns the number of goals updated.
+    """
+    stmt = update(Goal).values(
+        total_tasks=select(func.count(Task.id)).where(Task.goal_id == Goal.id).scalar_subquery(),
+        completed_tasks=select(func.count(Task.id)).where(
+            Task.goal_id == Goal.id,
+            Task.status == TaskStatus.COMPLETED
+        ).scalar_subquery(),
+        updated_at=Goal.updated_at
+    )
+    if goal_ids is not None:
+        stmt = stmt.where(Goal.id.in_(goal_ids))
+    return connection.execute(stmt).rowcount
+
+@event.listens_for(Task, "after_insert")
+def _count_inserted_task(mapper, connection, target):
+    completed = 1 if target.status == TaskStatus.COMPLETED else 0
+    _adjust_goal_counters(connection, target.goal_id, total=1, completed=completed)
+
+@event.listens_for(Task, "after_delete")
+def _count_deleted_task(mapper, connection, target):
+    completed = 1 if target.status == TaskStatus.COMPLETED else 0
+    _adjust_goal_counters(connection, target.goal_id, total=-1, completed=-completed)
+
+@event.listens_for(Task, "after_update")
+def _count_updated_task(mapper, connection, target):
+    """Apply status changes (mark_completed/mark_in_progress/mark_not_started) and goal moves."""
+    attrs = inspect(target).attrs
+    goal_history = attrs.goal_id.history
+    status_history = attrs.status.history
+    if not (goal_history.has_changes() or status_history.has_changes()):
+        return
+    
+    old_goal_id = goal_history.deleted[0] if goal_history.deleted else target.goal_id
+    new_completed = 1 if target.status == TaskStatus.COMPLETED else 0
+    if status_history.deleted:
+        old_completed = 1 if status_history.deleted[0] == TaskStatus.COMPLETED else 0
+    elif status_history.added:
+        # Previous status was never loaded; fall back to recounting the affected goals
+        recompute_goal_counters(connection, {old_goal_id, target.goal_id})
+        return
+    else:
+        old_completed = new_completed
+    
+    if old_goal_id != target.goal_id:
+        _adjust_goal_counters(connection, old_goal_id, total=-1, completed=-old_completed)
+        _adjust_goal_counters(connection, target.goal_id, total=1, completed=new_completed)
+    else:
+        _adjust_goal_counters(connection, target.goal_id, completed=new_completed - old_completed)
+
+def _utc_day(value):
+    if value is None:
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.date()
+
+def daily_progress_changes(transitions):
+    """Rollup deltas for task state transitions.
+    
+    Each transition is an (old, new) pair of (user_id, created_at, completed_at)
+    tuples, with None for a task that does not exist on that side. Returns one
+    parameter dict per (user_id, day) whose counts change.
+    """
+    deltas = defaultdict(lambda: [0, 0])
+    for old, new in transitions:
+        for state, sign in ((old, -1), (new, 1)):
+            if state is None:
+                continue
+            user_id, created_at, completed_at = state
+            if created_at is not None:
+                deltas[(user_id, _utc_day(created_at))][0] += sign
+            if completed_at is not None:
+                deltas[(user_id, _utc_day(completed_at))][1] += sign
+    return [
+        {"user_id": user_id, "day": day, "created_tasks": created, "completed_tasks": completed}
+        for (user_id, day), (created, completed) in deltas.items()
+        if created or completed
+    ]
+
+def daily_progress_upsert(dialect_name):
+    """INSERT ... ON CONFLICT statement adding the deltas from daily_progress_changes()."""
+    dialect_insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+    stmt = dialect_insert(DailyProgress)
+    return stmt.on_conflict_do_update(
+        index_elements=[DailyProgress.user_id, DailyProgress.day],
+        set_={
+            "created_tasks": DailyProgress.created_tasks + stmt.excluded.created_tasks,
+            "completed_tasks": DailyProgress.completed_tasks + stmt.excluded.completed_tasks,
+        }
+    )
+
+def _apply_daily_progress(connection, transitions):
+    changes = daily_progress_changes(transitions)
+    if changes:
+        connection.execute(daily_progress_upsert(connection.dialect.name), changes)
+
+def rebuild_daily_progress(connection, user_ids=None):
+    """Regenerate daily_progress from the tasks table, for every user or only `user_ids`.
+    
+    Returns the number of rollup rows written.
+    """
+    created = select(
+        Task.user_id, func.date(Task.created_at).label("day"),
+        literal(1).label("created_tasks"), literal(0).label("completed_tasks")
+    ).where(Task.created_at.isnot(None))
+    completed = select(
+        Task.user_id, func.date(Task.completed_at).label("day"),
+        literal(0).label("created_tasks"), literal(1).label("completed_tasks")
+    ).where(Task.completed_at.isnot(None))
+    clear = delete(DailyProgress)
+    if user_ids is not None:
+        created = created.where(Task.user_id.in_(user_ids))
+        completed = completed.where(Task.user_id.in_(user_ids))
+        clear = clear.where(DailyProgress.user_id.in_(user_ids))
+    
+    events = union_all(created, completed).subquery()
+    totals = select(
+        events.c.user_id, events.c.day,
+        func.sum(events.c.created_tasks), func.sum(events.c.completed_tasks)
+    ).group_by(events.c.user_id, events.c.day)
+    
+    connection.execute(clear)
+    return connection.execute(insert(DailyProgress).from_select(
+        ["user_id", "day", "created_tasks", "completed_tasks"], totals
+    )).rowcount
+
+def _previous_value(attr, current):
+    """Value of an attribute before this flush (None if it was only just set)."""
+    history = attr.history
+    if history.deleted:
+        return history.deleted[0]
+    if history.added:
+        return None
+    return current
+
+@event.listens_for(Task, "after_insert")
+def _roll_up_inserted_task(mapper, connection, target):
+    _apply_daily_progress(connection, [(None, (target.user_id, target.created_at, target.completed_at))])
+
+@event.listens_for(Task, "after_delete")
+def _roll_up_deleted_task(mapper, connection, target):
+    _apply_daily_progress(connection, [((target.user_id, target.created_at, target.completed_at), None)])
+
+@event.listens_for(Task, "after_update")
+def _roll_up_updated_task(mapper, connection, target):
+    """Move completions between days (and tasks between users) in the rollup."""
+    attrs = inspect(target).attrs
+    new = (target.user_id, target.created_at, target.completed_at)
+    old = (
+        _previous_value(attrs.user_id, target.user_id),
+        _previous_value(attrs.created_at, target.created_at),
+        _previous_value(attrs.completed_at, target.completed_at),
+    )
+    if old != new:
+        _apply_daily_progress(connection, [(old, new)])
+
+def data_version_bump(user_ids):
+    """UPDATE statement bumping users.data_version for one user id or a collection of them."""
+    if isinstance(user_ids, int):
+        user_ids = [user_ids]
+    return update(User).where(User.id.in_(user_ids)).values(
+        data_version=User.data_version + 1,
+        updated_at=User.updated_at
+    )
+
+def apply_bulk_task_writes(connection, transitions, user_ids=()):
+    """Apply what the flush hooks do for tasks written with bulk INSERT/UPDATE statements.
+    
+    Bulk ORM statements skip the flush hooks, so callers pass one (old, new) pair of
+    (goal_id, user_id, status, created_at, completed_at) tuples per written task, with
+    None for a task that does not exist on that side. Updates the goal counters, the
+    daily_progress rollup and the data version of every user involved, plus `user_ids`
+    (users whose other rows, e.g. bulk-inserted goals, changed). Call before the commit.
+    
+    The old states must be what the caller's statements actually replaced: pass only
+    rows matched by an UPDATE conditional on the version that was read, or the deltas
+    of concurrent writes to the same task are applied twice.
+    """
+    counters = defaultdict(lambda: [0, 0])
+    progress = []
+    user_ids = set(user_ids)
+    for old, new in transitions:
+        for state, sign in ((old, -1), (new, 1)):
+            if state is None:
+                continue
+            goal_id, user_id, status, _, _ = state
+            counters[goal_id][0] += sign
+            counters[goal_id][1] += sign * (status == TaskStatus.COMPLETED)
+            user_ids.add(user_id)
+        progress.append((old and old[1:2] + old[3:], new and new[1:2] + new[3:]))
+    
+    for goal_id, (total, completed) in counters.items():
+        _adjust_goal_counters(connection, goal_id, total=total, completed=completed)
+    _apply_daily_progress(connection, progress)
+    user_ids.discard(None)
+    if user_ids:
+        connection.execute(data_version_bump(user_ids))
+
+@event.listens_for(Session, "after_flush")
+def _bump_data_versions(session, flush_context):
+    """Bump the data version of every user whose goals or tasks were written in this flush."""
+    user_ids = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, (Goal, Task)):
+            user_ids.add(obj.user_id)
+            user_ids.update(inspect(obj).attrs.user_id.history.deleted)
+    user_ids.discard(None)
+    if user_ids:
+        session.connection().execute(data_version_bump(user_ids))
+
+def goal_response_options():
+    """Loader options for queries whose goals are serialized as GoalResponse."""
+    return (selectinload(Goal.tasks),)
@@ -0,0 +1,61 @@
+"""
+Keyset (cursor) pagination helpers.
+
+Pages are ordered by (sort key, id) and the next page starts strictly after
+the last row of the previous one, so fetching page N costs the same as page 1.
+The cursor is an opaque base64 token; it is returned to clients in the
+X-Next-Cursor response header and is absent on the last page.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import List, Optional, Tuple
+from fastapi import HTTPException, Response, status
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def validate_limit(limit: int) -> int:
+    if limit <= 0 or limit > MAX_PAGE_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Limit must be between 1 and {MAX_PAGE_SIZE}"
+        )
+    return limit
+
+
+def encode_cursor(sort_value: datetime, row_id: int) -> str:
+    payload = json.dumps([sort_value.isoformat(), row_id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(sort_value), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def keyset_page(query, sort_column, id_column, cursor: Optional[str], limit: int):
+    """Restrict a select() to the page after `cursor`, fetching one extra row to detect more pages."""
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor)
+        query = query.where(tuple_(sort_column, id_column) > tuple_(sort_value, row_id))
+    return query.order_by(sort_column.asc(), id_column.asc()).limit(limit + 1)
+
+
+def finish_page(rows: List, sort_attr: str, limit: int, response: Response) -> List:
+    """Trim the look-ahead row and publish the next cursor, if any, on the response."""
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(getattr(last, sort_attr), last.id)
+    return rows
@@ -0,0 +1,304 @@
+"""
+Opt-in statistical profiler for live requests.
+
+An admin starts a profiling session with a sampling fraction per route
+template (e.g. {"/api/dashboard/": 0.2}). ProfilingMiddleware marks that
+fraction of matching requests; while any marked request is in flight, a
+sampler thread reads the event loop thread's stack every `interval` seconds
+(sys._current_frames) and keeps it if the task running at that moment is a
+marked request. Busy threads of the bcrypt pool are sampled the same way, since
+password hashing does not run on the event loop.
+
+Stacks are aggregated as collapsed stacks ("route;frame;frame count"), the
+input format of flamegraph.pl and speedscope, and can be rendered to an SVG
+flame graph directly. summary() splits the samples by the library running at
+the leaf (ORM row hydration, the rest of SQLAlchemy, Pydantic, bcrypt, the
+database driver, compression, response serialization, application code).
+
+Outside a session the middleware costs one attribute check per request.
+Set PROFILER_ENABLED=true to install it and the admin endpoints.
+"""
+import asyncio
+import html
+import os
+import random
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from starlette.routing import Match
+from starlette.types import ASGIApp, Receive, Scope, Send
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "false").lower() in ("1", "true", "yes")
+# Sessions stop on their own after this many seconds
+PROFILER_MAX_DURATION = float(os.getenv("PROFILER_MAX_DURATION", "300"))
+# Distinct stacks kept per session; further new stacks are counted under "[truncated]"
+PROFILER_MAX_STACKS = int(os.getenv("PROFILER_MAX_STACKS", "20000"))
+MAX_STACK_DEPTH = 128
+# Prefix of the thread names sampled outside the event loop (see auth_utils.PasswordHashPool)
+SAMPLED_THREAD_PREFIXES = ("bcrypt",)
+
+# Leaf-most frame decides the component; checked in order, so specific paths come first
+COMPONENTS = [
+    ("orm_hydration", ("sqlalchemy/orm/loading.py", "sqlalchemy/orm/strategies.py", "sqlalchemy/engine/result.py")),
+    ("sqlalchemy", ("sqlalchemy/",)),
+    ("pydantic", ("pydantic/", "pydantic_core/", "fastapi/_compat.py")),
+    ("bcrypt", ("bcrypt/", "passlib/")),
+    ("database_driver", ("aiosqlite/", "asyncpg/", "sqlite3/")),
+    ("compression", ("compression_utils.py", "gzip.py")),
+    ("serialization", ("orjson", "fastapi/encoders.py", "starlette/responses.py")),
+]
+APP_ROOT = os.path.dirname(os.path.abspath(__file__)) + os.sep
+
+
+def frame_label(code) -> str:
+    filename = code.co_filename
+    marker = filename.rfind("site-packages" + os.sep)
+    if marker >= 0:
+        filename = filename[marker + len("site-packages") + 1:]
+    elif filename.startswith(APP_ROOT):
+        filename = filename[len(APP_ROOT):]
+    else:
+        filename = os.path.basename(filename)
+    # Semicolons separate frames in the collapsed format
+    return f"{filename}:{code.co_qualname}".replace(";", ",")
+
+
+def walk_stack(frame, depth: int = MAX_STACK_DEPTH) -> List[str]:
+    """Frame labels from the outermost caller to `frame`."""
+    labels = []
+    while frame is not None and len(labels) < depth:
+        labels.append(frame_label(frame.f_code))
+        frame = frame.f_back
+    labels.reverse()
+    return labels
+
+
+def component_of(stack: List[str]) -> str:
+    for label in reversed(stack):
+        for component, patterns in COMPONENTS:
+            if any(pattern in label for pattern in patterns):
+                return component
+    return "app" if stack else "other"
+
+
+class SamplingProfiler:
+    def __init__(self):
+        self.active = False
+        self.rates: Dict[str, float] = {}
+        self.default_rate = 0.0
+        self.interval = 0.005
+        self.started_at: Optional[float] = None
+        self.stopped_at: Optional[float] = None
+        self.duration = 0.0
+        self.deadline = 0.0
+        self.stacks: Counter = Counter()
+        self.requests: Counter = Counter()
+        self._tasks: Dict[asyncio.Task, str] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._session_lock = asyncio.Lock()
+
+    async def start(self, rates: Dict[str, float], default_rate: float = 0.0, interval: float = 0.005,
+                    duration: float = PROFILER_MAX_DURATION) -> None:
+        """Start a new session from the event loop, discarding the previous session's samples."""
+        async with self._session_lock:
+            await self._stop_session()
+            self.rates = dict(rates)
+            self.default_rate = default_rate
+            self.interval = interval
+            self.stacks = Counter()
+            self.requests = Counter()
+            self._loop = asyncio.get_running_loop()
+            self._loop_thread = threading.get_ident()
+            self.started_at = time.time()
+            self.stopped_at = None
+            self.duration = min(duration, PROFILER_MAX_DURATION)
+            self.deadline = time.monotonic() + self.duration
+            self._stop.clear()
+            self.active = True
+            self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+            self._thread.start()
+
+    async def stop(self) -> None:
+        """Stop the session; the sampler thread is joined off the event loop."""
+        async with self._session_lock:
+            await self._stop_session()
+
+    async def _stop_session(self) -> None:
+        # Only the event loop touches self._thread; the sampler thread just clears `active` at its deadline
+        thread = self._thread
+        if thread is None:
+            return
+        self._thread = None
+        self.active = False
+        self._stop.set()
+        await asyncio.to_thread(thread.join)
+        self._tasks.clear()
+        self.stopped_at = min(time.time(), self.started_at + self.duration)
+
+    def should_sample(self, route: str) -> bool:
+        rate = self.rates.get(route, self.default_rate)
+        return rate > 0 and random.random() < rate
+
+    def track(self, task: asyncio.Task, route: str) -> None:
+        self._tasks[task] = route
+        self.requests[route] += 1
+
+    def untrack(self, task: asyncio.Task) -> None:
+        self._tasks.pop(task, None)
+
+    def _record(self, stack: Tuple[str, ...]) -> None:
+        with self._lock:
+            if stack not in self.stacks and len(self.stacks) >= PROFILER_MAX_STACKS:
+                stack = stack[:1] + ("[truncated]",)
+            self.stacks[stack] += 1
+
+    def _sample(self) -> None:
+        frames = sys._current_frames()
+        # Reading the loop's current task from another thread is racy, but at worst misattributes one sample
+        task = asyncio.current_task(self._loop)
+        route = self._tasks.get(task)
+        if route is not None and self._loop_thread in frames:
+            self._record((route, *walk_stack(frames[self._loop_thread])))
+        for thread in threading.enumerate():
+            if not thread.name.startswith(SAMPLED_THREAD_PREFIXES) or thread.ident not in frames:
+                continue
+            stack = walk_stack(frames[thread.ident])
+            # Idle pool threads wait in the executor's work queue
+            if stack and stack[-1] != "thread.py:_worker":
+                self._record((f"[{thread.name.split('_')[0]} thread]", *stack))
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            if time.monotonic() >= self.deadline:
+                # Stopped for good by the next stop() or start() on the event loop
+                self.active = False
+                return
+            if self._tasks:
+                self._sample()
+
+    def collapsed(self) -> str:
+        """Samples in collapsed-stack format, one "frame;frame;... count" line per distinct stack."""
+        with self._lock:
+            stacks = list(self.stacks.items())
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in sorted(stacks))
+
+    def summary(self) -> Dict:
+        with self._lock:
+            stacks = list(self.stacks.items())
+        components = Counter()
+        routes = Counter()
+        for stack, count in stacks:
+            components[component_of(list(stack[1:]))] += count
+            routes[stack[0]] += count
+        total = sum(components.values())
+        stopped_at = self.stopped_at
+        if stopped_at is None and not self.active and self.started_at is not None:
+            # Past its deadline: stopped even if nobody called stop() yet
+            stopped_at = self.started_at + self.duration
+        return {
+            "active": self.active,
+            "started_at": self.started_at,
+            "stopped_at": stopped_at,
+            "interval_ms": self.interval * 1000,
+            "rates": self.rates,
+            "default_rate": self.default_rate,
+            "sampled_requests": dict(self.requests),
+            "samples": total,
+            "samples_by_route": dict(routes),
+            "components": {
+                component: {"samples": count, "share": round(count / total, 4)}
+                for component, count in components.most_common()
+            },
+        }
+
+    def flamegraph(self, width: int = 1200, frame_height: int = 16) -> str:
+        """Render the samples as a self-contained SVG flame graph (hover a frame for its sample count)."""
+        with self._lock:
+            stacks = list(self.stacks.items())
+        # Build the call tree: name -> [count, children]
+        root = [0, {}]
+        for stack, count in stacks:
+            root[0] += count
+            node = root
+            for label in stack:
+                node = node[1].setdefault(label, [0, {}])
+                node[0] += count
+
+        rects = []
+        depth_seen = [0]
+
+        def place(children: Dict, x: float, depth: int, scale: float) -> None:
+            depth_seen[0] = max(depth_seen[0], depth)
+            for label, (count, grandchildren) in sorted(children.items()):
+                w = count * scale
+                if w >= 0.5:
+                    rects.append((x, depth, w, label, count))
+                    place(grandchildren, x, depth + 1, scale)
+                x += w
+
+        if root[0]:
+            place(root[1], 0.0, 0, width / root[0])
+        height = (depth_seen[0] + 1) * frame_height
+        parts = [
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+            f'font-family="monospace" font-size="11">'
+        ]
+        for x, depth, w, label, count in rects:
+            y = height - (depth + 1) * frame_height
+            hue = 20 + zlib.crc32(label.encode()) % 40
+            title = f"{html.escape(label)} ({count} samples, {count / root[0]:.1%})"
+            # Roughly 7px per character at this font size
+            chars = int(w / 7)
+            shown = label if len(label) <= chars else label[:chars - 2] + ".." if chars > 3 else ""
+            shown = html.escape(shown)
+            parts.append(
+                f'<g><title>{title}</title><rect x="{x:.1f}" y="{y}" width="{w:.1f}" height="{frame_height - 1}" '
+                f'fill="hsl({hue},80%,60%)"/><text x="{x + 2:.1f}" y="{y + frame_height - 4}">{shown}</text></g>'
+            )
+        parts.append("</svg>")
+        return "\n".join(parts)
+
+
+profiler = SamplingProfiler()
+
+
+def match_route(scope: Scope) -> Optional[str]:
+    """Template of the route the router will pick for this request."""
+    for route in scope["app"].router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", None)
+    return None
+
+
+class ProfilingMiddleware:
+    def __init__(self, app: ASGIApp, profiler: SamplingProfiler = profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.profiler.active:
+            await self.app(scope, receive, send)
+            return
+
+        route = match_route(scope)
+        if route is None or not self.profiler.should_sample(route):
+            await self.app(scope, receive, send)
+            return
+
+        task = asyncio.current_task()
+        self.profiler.track(task, route)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.profiler.untrack(task)
@@ -0,0 +1,86 @@
+"""
+Bucketed time-series queries for progress tracking.
+
+Progress is read from the daily_progress rollup with two queries regardless of
+the requested range: the per-day rows inside the range (at most about a year)
+and the number of tasks created before it. Days are grouped into buckets and
+running totals accumulated in Python.
+"""
+from collections import Counter
+from datetime import date, datetime, time, timedelta, timezone
+from typing import List
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import DailyProgress
+from schemas import ProgressData, ProgressGranularity
+
+
+def bucket_start(day: date, granularity: ProgressGranularity) -> date:
+    """Return the first day of the bucket that contains `day`."""
+    if granularity == ProgressGranularity.WEEK:
+        return day - timedelta(days=day.weekday())
+    if granularity == ProgressGranularity.MONTH:
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(day: date, granularity: ProgressGranularity) -> date:
+    """Return the first day of the bucket following the one starting at `day`."""
+    if granularity == ProgressGranularity.WEEK:
+        return day + timedelta(days=7)
+    if granularity == ProgressGranularity.MONTH:
+        if day.month == 12:
+            return day.replace(year=day.year + 1, month=1)
+        return day.replace(month=day.month + 1)
+    return day + timedelta(days=1)
+
+
+def _as_utc_datetime(day: date) -> datetime:
+    return datetime.combine(day, time.min, tzinfo=timezone.utc)
+
+
+async def build_progress_series(db: AsyncSession, user_id: int, days: int,
+                                granularity: ProgressGranularity = ProgressGranularity.DAY) -> List[ProgressData]:
+    """Build the progress series for the last `days` days (including today, UTC)."""
+    today = datetime.now(timezone.utc).date()
+    first_bucket = bucket_start(today - timedelta(days=days - 1), granularity)
+    end_bucket = next_bucket(bucket_start(today, granularity), granularity)
+
+    result = await db.execute(select(
+        DailyProgress.day, DailyProgress.created_tasks, DailyProgress.completed_tasks
+    ).where(
+        DailyProgress.user_id == user_id,
+        DailyProgress.day >= first_bucket,
+        DailyProgress.day < end_bucket
+    ))
+    completed, created = Counter(), Counter()
+    for day, created_tasks, completed_tasks in result.all():
+        bucket = bucket_start(day, granularity)
+        completed[bucket] += completed_tasks
+        created[bucket] += created_tasks
+
+    # Tasks that already existed when the range starts
+    result = await db.execute(select(func.sum(DailyProgress.created_tasks)).where(
+        DailyProgress.user_id == user_id,
+        DailyProgress.day < first_bucket
+    ))
+    total_tasks = result.scalar() or 0
+
+    progress_data = []
+    current = first_bucket
+    while current < end_bucket:
+        completed_in_bucket = completed.get(current, 0)
+        completion_rate = (completed_in_bucket / total_tasks * 100) if total_tasks > 0 else 0
+
+        progress_data.append(ProgressData(
+            date=_as_utc_datetime(current),
+            completed_tasks=completed_in_bucket,
+            total_tasks=total_tasks,
+            completion_rate=round(completion_rate, 2)
+        ))
+
+        # Tasks created during this bucket count towards the following ones
+        total_tasks += created.get(current, 0)
+        current = next_bucket(current, granularity)
+
+    return progress_data
@@ -0,0 +1,86 @@
+"""
+Per-request database statistics.
+
+QueryTimingMiddleware collects, through the cursor hooks in database.py, how
+many statements a request ran, their total time and the slowest one. It adds
+them to the response as a Server-Timing header (visible in browser dev tools)
+and writes one logfmt line per request to the "request_stats" logger. Requests
+running more than QUERY_BUDGET statements are logged as warnings, which is how
+N+1 patterns (a query per row or per day) show up.
+
+Set SERVER_TIMING_ENABLED=false to omit the header; QUERY_BUDGET=0 disables
+the warning.
+"""
+import logging
+import os
+import time
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from database import QueryStats, current_query_stats
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger("request_stats")
+
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "true").lower() in ("1", "true", "yes")
+QUERY_BUDGET = int(os.getenv("QUERY_BUDGET", "20"))
+# Longest slowest-statement text written to the log
+SLOW_STATEMENT_LOG_LENGTH = 300
+
+
+def server_timing(stats: QueryStats, elapsed: float) -> str:
+    return (
+        f'db;dur={stats.total_seconds * 1000:.2f};desc="{stats.count} queries", '
+        f'db-slowest;dur={stats.slowest_seconds * 1000:.2f}, '
+        f'app;dur={elapsed * 1000:.2f}'
+    )
+
+
+def log_line(scope: Scope, status: int, stats: QueryStats, elapsed: float) -> str:
+    statement = " ".join((stats.slowest_statement or "").split())[:SLOW_STATEMENT_LOG_LENGTH]
+    statement = statement.replace('"', "'")
+    return (
+        f"method={scope['method']} path={scope['path']} status={status} duration_ms={elapsed * 1000:.2f} "
+        f"queries={stats.count} db_ms={stats.total_seconds * 1000:.2f} "
+        f'slowest_ms={stats.slowest_seconds * 1000:.2f} slowest="{statement}"'
+    )
+
+
+class QueryTimingMiddleware:
+    def __init__(self, app: ASGIApp, query_budget: int = QUERY_BUDGET, server_timing: bool = SERVER_TIMING_ENABLED):
+        self.app = app
+        self.query_budget = query_budget
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = current_query_stats.set(stats)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    # Streaming responses may still query after this; the log line has the final numbers
+                    MutableHeaders(raw=message["headers"]).append(
+                        "Server-Timing", server_timing(stats, time.perf_counter() - start)
+                    )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_query_stats.reset(token)
+            elapsed = time.perf_counter() - start
+            line = log_line(scope, status, stats, elapsed)
+            if self.query_budget and stats.count > self.query_budget:
+                logger.warning("Query budget of %s exceeded: %s", self.query_budget, line)
+            else:
+                logger.info(line)
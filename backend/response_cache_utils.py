@@ -0,0 +1,141 @@
+"""
+Per-user caching of rendered read responses.
+
+Decorating a GET endpoint with @cached_response(...) stores its serialized body
+in the response cache, keyed by user, URL and the ETag computed by
+etag_utils.conditional_get. The ETag changes with users.data_version, so a
+write makes every worker miss; the body stored is only as fresh as the data the
+endpoint reads, so any cache the endpoint itself uses must be keyed by the data
+version too (as stats_utils.DashboardStatsProvider is). The tags let write
+handlers evict entries right away with invalidate_user_caches(). Concurrent
+misses for the same key are loaded once (single-flight, per worker).
+
+RESPONSE_CACHE_BACKEND selects "memory" (per worker LRU, the default), "redis"
+(shared, at RESPONSE_CACHE_URL) or "none".
+"""
+import functools
+import inspect
+import os
+import orjson
+from typing import Optional
+from fastapi import Request, Response
+from fastapi.datastructures import DefaultPlaceholder
+from fastapi.routing import serialize_response
+from cache_utils import TaggedCache, MemoryCacheBackend, RedisCacheBackend
+from stats_utils import dashboard_stats
+from dotenv import load_dotenv
+
+load_dotenv()
+
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory").lower()
+RESPONSE_CACHE_URL = os.getenv("RESPONSE_CACHE_URL", "redis://localhost:6379/0")
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "60"))
+# Larger bodies are served but not cached
+RESPONSE_CACHE_MAX_ENTRY_SIZE = int(os.getenv("RESPONSE_CACHE_MAX_ENTRY_SIZE", str(256 * 1024)))
+
+# Tags: the data a cached response is built from
+GOALS = "goals"
+TASKS = "tasks"
+
+
+def build_response_cache() -> Optional[TaggedCache]:
+    if RESPONSE_CACHE_BACKEND == "none":
+        return None
+    if RESPONSE_CACHE_BACKEND == "redis":
+        backend = RedisCacheBackend.from_url(RESPONSE_CACHE_URL)
+    else:
+        backend = MemoryCacheBackend(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL)
+    return TaggedCache(backend, ttl=RESPONSE_CACHE_TTL, max_entry_size=RESPONSE_CACHE_MAX_ENTRY_SIZE)
+
+
+response_cache = build_response_cache()
+
+
+def user_tag(user_id: int, tag: str) -> str:
+    return f"user:{user_id}:{tag}"
+
+
+async def invalidate_user_responses(user_id: int, *tags: str) -> None:
+    """Evict the user's cached responses built from any of `tags` (call after the commit)."""
+    if response_cache is not None:
+        await response_cache.invalidate(*(user_tag(user_id, tag) for tag in tags))
+
+
+async def invalidate_user_caches(user_id: int, *tags: str) -> None:
+    """Drop the user's cached dashboard stats and the responses built from `tags` (call after the commit)."""
+    dashboard_stats.invalidate(user_id)
+    await invalidate_user_responses(user_id, *tags)
+
+
+async def render_response(request: Request, content) -> bytes:
+    """Serialize endpoint output the way FastAPI would for the matched route."""
+    route = request.scope["route"]
+    content = await serialize_response(
+        field=route.response_field,
+        response_content=content,
+        include=route.response_model_include,
+        exclude=route.response_model_exclude,
+        by_alias=route.response_model_by_alias,
+        exclude_unset=route.response_model_exclude_unset,
+        exclude_defaults=route.response_model_exclude_defaults,
+        exclude_none=route.response_model_exclude_none,
+    )
+    return response_class(request)(content).body
+
+
+def response_class(request: Request):
+    route_class = request.scope["route"].response_class
+    return route_class.value if isinstance(route_class, DefaultPlaceholder) else route_class
+
+
+def cached_response(*tags: str, ttl: Optional[float] = None):
+    """Cache a GET endpoint's response per user and URL.
+
+    `tags` name the data the response is built from (GOALS, TASKS). The endpoint must
+    take `current_user`. Headers the endpoint sets (e.g. X-Next-Cursor) are cached
+    with the body. `ttl=0` disables caching for the endpoint.
+    """
+    def decorator(endpoint):
+        signature = inspect.signature(endpoint)
+        if "current_user" not in signature.parameters:
+            raise TypeError(f"{endpoint.__name__} needs a current_user parameter to be cached per user")
+        # FastAPI injects the request and response into one parameter each (ours), so pass them on
+        request_params = [name for name, param in signature.parameters.items() if param.annotation is Request]
+        response_params = [name for name, param in signature.parameters.items() if param.annotation is Response]
+
+        @functools.wraps(endpoint)
+        async def wrapper(*args, cache_request: Request, cache_response: Response, **kwargs):
+            kwargs.update({name: cache_request for name in request_params})
+            kwargs.update({name: cache_response for name in response_params})
+            if response_cache is None or ttl == 0:
+                return await endpoint(*args, **kwargs)
+
+            user_id = kwargs["current_user"].id
+            url = cache_request.url
+            key = f"response:{user_id}:{url.path}?{url.query}#{cache_response.headers.get('etag', '')}"
+
+            async def load() -> bytes:
+                before = set(cache_response.headers.keys())
+                content = await endpoint(*args, **kwargs)
+                body = await render_response(cache_request, content)
+                headers = {name: value for name, value in cache_response.headers.items() if name not in before}
+                return orjson.dumps(headers) + b"\n" + body
+
+            headers, _, body = (await response_cache.get_or_load(
+                key, [user_tag(user_id, tag) for tag in tags], load, ttl
+            )).partition(b"\n")
+            # Returning a Response skips FastAPI's merge of dependency-set headers (ETag), so merge here
+            response = Response(body, media_type=response_class(cache_request).media_type)
+            response.headers.update(orjson.loads(headers))
+            response.headers.update(cache_response.headers)
+            return response
+
+        extra = [
+            inspect.Parameter("cache_request", inspect.Parameter.KEYWORD_ONLY, annotation=Request),
+            inspect.Parameter("cache_response", inspect.Parameter.KEYWORD_ONLY, annotation=Response),
+        ]
+        wrapper.__signature__ = signature.replace(parameters=[*signature.parameters.values(), *extra])
+        return wrapper
+
+    return decorator
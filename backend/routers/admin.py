@@ -0,0 +1,39 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse, Response
+from schemas import ProfilerStart
+from auth_utils import get_admin_identity
+from profiling_utils import profiler
+
+router = APIRouter(dependencies=[Depends(get_admin_identity)])
+
+@router.post("/profiler/start")
+async def start_profiler(settings: ProfilerStart):
+    """Start a profiling session, discarding the previous session's samples."""
+    await profiler.start(
+        settings.rates,
+        default_rate=settings.default_rate,
+        interval=settings.interval_ms / 1000,
+        duration=settings.duration
+    )
+    return profiler.summary()
+
+@router.post("/profiler/stop")
+async def stop_profiler():
+    """Stop sampling; the samples stay available until the next session starts."""
+    await profiler.stop()
+    return profiler.summary()
+
+@router.get("/profiler")
+async def get_profiler_summary():
+    """Session state and the share of samples per component (ORM hydration, Pydantic, bcrypt, ...)."""
+    return profiler.summary()
+
+@router.get("/profiler/collapsed", response_class=PlainTextResponse)
+async def get_collapsed_stacks():
+    """Samples as collapsed stacks, for flamegraph.pl or speedscope."""
+    return PlainTextResponse(profiler.collapsed())
+
+@router.get("/profiler/flamegraph")
+async def get_flamegraph():
+    """Samples as an SVG flame graph."""
+    return Response(profiler.flamegraph(), media_type="image/svg+xml")
@@ -1,72 +1,48 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
-from typing import List
-from datetime import datetime, timedelta, timezone
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from datetime import datetime, timezone
 from database import get_db
-from models import Task, Goal, User, TaskStatus
-from schemas import DashboardResponse, DashboardStats, GoalResponse, TaskResponse, ProgressResponse, ProgressData
-from auth_utils import get_current_user
+from models import Task, Goal, TaskStatus, goal_response_options
+from schemas import DashboardResponse, GoalResponse, TaskResponse, ProgressResponse, ProgressGranularity
+from auth_utils import get_current_identity, UserIdentity
+from progress_utils import build_progress_series
+from stats_utils import dashboard_stats, DASHBOARD_STATS_MAX_STALENESS
+from etag_utils import conditional_get
+from response_cache_utils import cached_response, GOALS, TASKS
+from pagination_utils import DEFAULT_PAGE_SIZE, validate_limit, keyset_page, finish_page
 
 router = APIRouter()
 
+# Dashboard responses depend on the clock, so their ETags also expire after this many seconds
+not_modified = Depends(conditional_get(window=DASHBOARD_STATS_MAX_STALENESS or 1))
+
 @router.get("/", response_model=DashboardResponse)
+@cached_response(GOALS, TASKS, ttl=DASHBOARD_STATS_MAX_STALENESS)
 async def get_dashboard(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    data_version: int = not_modified,
+    current_user: UserIdentity = Depends(get_current_identity),
+    db: AsyncSession = Depends(get_db)
 ):
     """Get dashboard data with statistics and recent items."""
     
-    # Get basic statistics
-    total_goals = db.query(Goal).filter(Goal.user_id == current_user.id).count()
-    
-    total_tasks = db.query(Task).join(Goal).filter(Goal.user_id == current_user.id).count()
-    
-    completed_tasks = db.query(Task).join(Goal).filter(
-        Goal.user_id == current_user.id,
-        Task.status == TaskStatus.COMPLETED
-    ).count()
+    # Get basic statistics (single aggregate query, cached per user and data version)
+    stats = await dashboard_stats.get(db, current_user.id, data_version)
     
-    in_progress_tasks = db.query(Task).join(Goal).filter(
-        Goal.user_id == current_user.id,
-        Task.status == TaskStatus.IN_PROGRESS
-    ).count()
-    
-    # Get overdue tasks (past due date and not completed)
     now = datetime.now(timezone.utc)
-    overdue_tasks = db.query(Task).join(Goal).filter(
-        Goal.user_id == current_user.id,
-        Task.due_date < now,
-        Task.status != TaskStatus.COMPLETED
-    ).count()
-    
-    # Get upcoming deadlines (within next 7 days)
-    next_week = now + timedelta(days=7)
-    upcoming_deadlines = db.query(Goal).filter(
-        Goal.user_id == current_user.id,
-        Goal.deadline >= now,
-        Goal.deadline <= next_week
-    ).count()
-    
-    # Create statistics object
-    stats = DashboardStats(
-        total_goals=total_goals,
-        total_tasks=total_tasks,
-        completed_tasks=completed_tasks,
-        in_progress_tasks=in_progress_tasks,
-        overdue_tasks=overdue_tasks,
-        upcoming_deadlines=upcoming_deadlines
-    )
     
     # Get recent goals (last 5 created)
-    recent_goals = db.query(Goal).filter(Goal.user_id == current_user.id).order_by(Goal.created_at.desc()).limit(5).all()
+    result = await db.execute(select(Goal).options(*goal_response_options()).where(Goal.user_id == current_user.id).order_by(Goal.created_at.desc()).limit(5))
+    recent_goals = result.scalars().all()
     
     # Get upcoming tasks (next 10 tasks ordered by due date)
-    upcoming_tasks = db.query(Task).join(Goal).filter(
-        Goal.user_id == current_user.id,
+    result = await db.execute(select(Task).where(
+        Task.user_id == current_user.id,
         Task.status != TaskStatus.COMPLETED,
         Task.due_date >= now
-    ).order_by(Task.due_date.asc()).limit(10).all()
+    ).order_by(Task.due_date.asc()).limit(10))
+    upcoming_tasks = result.scalars().all()
     
     return DashboardResponse(
         stats=stats,
@@ -74,13 +50,18 @@ async def get_dashboard(
         upcoming_tasks=upcoming_tasks
     )
 
-@router.get("/progress", response_model=ProgressResponse)
+@router.get("/progress", response_model=ProgressResponse, dependencies=[not_modified])
+@cached_response(TASKS, ttl=DASHBOARD_STATS_MAX_STALENESS)
 async def get_progress_data(
     days: int = 30,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    granularity: ProgressGranularity = ProgressGranularity.DAY,
+    current_user: UserIdentity = Depends(get_current_identity),
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get progress data for visualization (completed tasks over time)."""
+    """Get progress data for visualization (completed tasks over time).
+    
+    Data is bucketed per day, week or month depending on `granularity`.
+    """
     
     if days <= 0 or days > 365:
         raise HTTPException(
@@ -88,49 +69,19 @@ async def get_progress_data(
             detail="Days must be between 1 and 365"
         )
     
-    end_date = datetime.now(timezone.utc)
-    start_date = end_date - timedelta(days=days)
-    
-    progress_data = []
-    
-    # Get data for each day
-    for i in range(days):
-        current_date = start_date + timedelta(days=i)
-        next_date = current_date + timedelta(days=1)
-        
-        # Count completed tasks on this day
-        completed_on_day = db.query(Task).join(Goal).filter(
-            Goal.user_id == current_user.id,
-            Task.completed_at >= current_date,
-            Task.completed_at < next_date
-        ).count()
-        
-        # Count total tasks that existed on this day
-        total_tasks_on_day = db.query(Task).join(Goal).filter(
-            Goal.user_id == current_user.id,
-            Task.created_at <= current_date
-        ).count()
-        
-        # Calculate completion rate
-        completion_rate = (completed_on_day / total_tasks_on_day * 100) if total_tasks_on_day > 0 else 0
-        
-        progress_data.append(ProgressData(
-            date=current_date,
-            completed_tasks=completed_on_day,
-            total_tasks=total_tasks_on_day,
-            completion_rate=round(completion_rate, 2)
-        ))
+    progress_data = await build_progress_series(db, current_user.id, days, granularity)
     
     return ProgressResponse(
         progress_data=progress_data,
         total_days=days
     )
 
-@router.get("/goals/recent", response_model=List[GoalResponse])
+@router.get("/goals/recent", response_model=List[GoalResponse], dependencies=[not_modified])
+@cached_response(GOALS, TASKS, ttl=DASHBOARD_STATS_MAX_STALENESS)
 async def get_recent_goals(
     limit: int = 5,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserIdentity = Depends(get_current_identity),
+    db: AsyncSession = Depends(get_db)
 ):
     """Get recent goals."""
     
@@ -140,14 +91,16 @@ async def get_recent_goals(
             detail="Limit must be between 1 and 50"
         )
     
-    goals = db.query(Goal).filter(Goal.user_id == current_user.id).order_by(Goal.created_at.desc()).limit(limit).all()
+    result = await db.execute(select(Goal).options(*goal_response_options()).where(Goal.user_id == current_user.id).order_by(Goal.created_at.desc()).limit(limit))
+    goals = result.scalars().all()
     return goals
 
-@router.get("/tasks/upcoming", response_model=List[TaskResponse])
+@router.get("/tasks/upcoming", response_model=List[TaskResponse], dependencies=[not_modified])
+@cached_response(TASKS, ttl=DASHBOARD_STATS_MAX_STALENESS)
 async def get_upcoming_tasks(
     limit: int = 10,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserIdentity = Depends(get_current_identity),
+    db: AsyncSession = Depends(get_db)
 ):
     """Get upcoming tasks (ordered by due date)."""
     
@@ -158,26 +111,34 @@ async def get_upcoming_tasks(
         )
     
     now = datetime.now(timezone.utc)
-    tasks = db.query(Task).join(Goal).filter(
-        Goal.user_id == current_user.id,
+    result = await db.execute(select(Task).where(
+        Task.user_id == current_user.id,
         Task.status != TaskStatus.COMPLETED,
         Task.due_date >= now
-    ).order_by(Task.due_date.asc()).limit(limit).all()
+    ).order_by(Task.due_date.asc()).limit(limit))
+    tasks = result.scalars().all()
     
     return tasks
 
-@router.get("/tasks/overdue", response_model=List[TaskResponse])
+@router.get("/tasks/overdue", response_model=List[TaskResponse], dependencies=[not_modified])
+@cached_response(TASKS, ttl=DASHBOARD_STATS_MAX_STALENESS)
 async def get_overdue_tasks(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    response: Response,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    current_user: UserIdentity = Depends(get_current_identity),
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get overdue tasks."""
+    """Get overdue tasks (ordered by due date, paginated by cursor)."""
     
+    validate_limit(limit)
     now = datetime.now(timezone.utc)
-    tasks = db.query(Task).join(Goal).filter(
-        Goal.user_id == current_user.id,
+    query = select(Task).where(
+        Task.user_id == current_user.id,
         Task.due_date < now,
         Task.status != TaskStatus.COMPLETED
-    ).order_by(Task.due_date.asc()).all()
+    )
+    result = await db.execute(keyset_page(query, Task.due_date, Task.id, cursor, limit))
+    tasks = finish_page(result.scalars().all(), "due_date", limit, response)
     
     return tasks 
\ No newline at end of file
@@ -0,0 +1,47 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from database import AsyncSessionLocal
+from models import Goal, Task
+from auth_utils import get_current_identity, UserIdentity
+from export_utils import (
+    ExportFormat, MEDIA_TYPES, GOAL_FIELDS, TASK_FIELDS, GOAL_COLUMNS, TASK_COLUMNS,
+    to_record, format_ndjson, format_csv,
+)
+
+router = APIRouter()
+
+# Rows fetched from the server-side cursor per round trip / per streamed chunk
+EXPORT_BATCH_SIZE = 500
+
+async def stream_export(user_id: int, export_format: ExportFormat):
+    """Yield the user's goals, then their tasks, one batch at a time.
+    
+    Uses its own session so the cursor stays open for the whole response.
+    """
+    formatter = format_ndjson if export_format == ExportFormat.NDJSON else format_csv
+    if export_format == ExportFormat.CSV:
+        yield format_csv([], header=True)
+    
+    queries = [
+        ("goal", GOAL_FIELDS, select(*GOAL_COLUMNS).where(Goal.user_id == user_id).order_by(Goal.id)),
+        ("task", TASK_FIELDS, select(*TASK_COLUMNS).where(Task.user_id == user_id).order_by(Task.id)),
+    ]
+    async with AsyncSessionLocal() as db:
+        for record_type, fields, query in queries:
+            result = await db.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+            async for rows in result.partitions():
+                yield formatter(to_record(record_type, fields, row) for row in rows)
+
+@router.get("/")
+async def export_data(
+    format: ExportFormat = ExportFormat.NDJSON,
+    current_user: UserIdentity = Depends(get_current_identity)
+):
+    """Stream all of the current user's goals and tasks as NDJSON or CSV."""
+    
+    return StreamingResponse(
+        stream_export(current_user.id, format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="learning_tracker_export.{format.value}"'}
+    )
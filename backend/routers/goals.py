@@ -1,18 +1,84 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from database import get_db
-from models import Goal, User
-from schemas import GoalCreate, GoalUpdate, GoalResponse
-from auth_utils import get_current_user
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from database import get_db, commit_or_conflict
+from models import Goal, Task, goal_response_options, progress_percentage
+from schemas import GoalCreate, GoalUpdate, GoalResponse, PartialGoalResponse, TaskResponse
+from auth_utils import get_current_identity, UserIdentity
+from etag_utils import conditional_get
+from response_cache_utils import cached_response, invalidate_user_caches, GOALS, TASKS
+from pagination_utils import DEFAULT_PAGE_SIZE, validate_limit, keyset_page, finish_page
 
 router = APIRouter()
+not_modified = Depends(conditional_get())
+
+# Goal fields selectable with `fields=`; tasks are added with `include=tasks`
+GOAL_FIELDS = [name for name in GoalResponse.model_fields if name != "tasks"]
+GOAL_INCLUDES = {"tasks"}
+TASK_COLUMNS = [getattr(Task, name) for name in TaskResponse.model_fields]
+
+def split_param(value: Optional[str]) -> List[str]:
+    return [item.strip() for item in (value or "").split(",") if item.strip()]
+
+def parse_goal_projection(fields: Optional[str], include: Optional[str]) -> Optional[Tuple[List[str], bool]]:
+    """Return (field names, include tasks) for a sparse request, or None for the full GoalResponse."""
+    if fields is None and include is None:
+        return None
+    names = split_param(fields) or list(GOAL_FIELDS)
+    includes = split_param(include)
+    unknown = [name for name in names if name not in GOAL_FIELDS] + [name for name in includes if name not in GOAL_INCLUDES]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown field(s): {', '.join(unknown)}"
+        )
+    if "id" not in names:
+        names.insert(0, "id")
+    return names, "tasks" in includes
+
+def goal_projection_query(names: List[str]):
+    """select() of only the goal columns needed for `names` (plus the keyset pagination columns)."""
+    columns = {"id", "created_at"}
+    for name in names:
+        columns.update(("completed_tasks", "total_tasks") if name == "progress_percentage" else (name,))
+    return select(*[getattr(Goal, column) for column in GOAL_FIELDS if column in columns])
+
+async def project_goals(db: AsyncSession, rows, names: List[str], include_tasks: bool) -> List[Dict]:
+    """Build sparse goal dicts from projected rows, attaching task dicts with one extra query if asked."""
+    goals = []
+    for row in rows:
+        values = row._mapping
+        goal = {
+            name: progress_percentage(values["completed_tasks"], values["total_tasks"])
+            if name == "progress_percentage" else values[name]
+            for name in names
+        }
+        goals.append(goal)
+    if include_tasks and goals:
+        tasks_by_goal = defaultdict(list)
+        result = await db.execute(
+            select(*TASK_COLUMNS).where(Task.goal_id.in_([goal["id"] for goal in goals])).order_by(Task.id)
+        )
+        for task in result.mappings():
+            tasks_by_goal[task["goal_id"]].append(dict(task))
+        for goal in goals:
+            goal["tasks"] = tasks_by_goal[goal["id"]]
+    return goals
+
+async def load_goal_for_response(db: AsyncSession, goal_id: int) -> Goal:
+    """Reload a goal with its tasks and counters after a write (no lazy loads in async)."""
+    result = await db.execute(
+        select(Goal).options(*goal_response_options()).where(Goal.id == goal_id).execution_options(populate_existing=True)
+    )
+    return result.scalars().one()
 
 @router.post("/", response_model=GoalResponse, status_code=status.HTTP_201_CREATED)
 async def create_goal(
     goal: GoalCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserIdentity = Depends(get_current_identity),
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new learning goal."""
     
@@ -26,33 +92,80 @@ async def create_goal(
     )
     
     db.add(db_goal)
-    db.commit()
-    db.refresh(db_goal)
+    await db.commit()
+    await invalidate_user_caches(current_user.id, GOALS)
     
-    return db_goal
+    return await load_goal_for_response(db, db_goal.id)
 
-@router.get("/", response_model=List[GoalResponse])
+@router.get(
+    "/",
+    response_model=List[PartialGoalResponse],
+    response_model_exclude_unset=True,
+    dependencies=[not_modified]
+)
+@cached_response(GOALS, TASKS)
 async def get_goals(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    response: Response,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    include: Optional[str] = None,
+    current_user: UserIdentity = Depends(get_current_identity),
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get all goals for the current user."""
-    
-    goals = db.query(Goal).filter(Goal.user_id == current_user.id).all()
-    return goals
+    """Get goals for the current user, oldest first.
+    
+    Results are paginated; pass the X-Next-Cursor response header back as `cursor`.
+    Without `fields`/`include` every goal is a full GoalResponse with its tasks. Otherwise
+    only the comma-separated `fields` (all goal fields if omitted) are returned, and tasks
+    only with `include=tasks`.
+    """
+    
+    validate_limit(limit)
+    projection = parse_goal_projection(fields, include)
+    
+    if projection is None:
+        query = select(Goal).options(*goal_response_options()).where(Goal.user_id == current_user.id)
+        result = await db.execute(keyset_page(query, Goal.created_at, Goal.id, cursor, limit))
+        goals = finish_page(result.scalars().all(), "created_at", limit, response)
+        return goals
+    
+    names, include_tasks = projection
+    query = goal_projection_query(names).where(Goal.user_id == current_user.id)
+    result = await db.execute(keyset_page(query, Goal.created_at, Goal.id, cursor, limit))
+    rows = finish_page(result.all(), "created_at", limit, response)
+    return await project_goals(db, rows, names, include_tasks)
 
-@router.get("/{goal_id}", response_model=GoalResponse)
+@router.get(
+    "/{goal_id}",
+    response_model=PartialGoalResponse,
+    response_model_exclude_unset=True,
+    dependencies=[not_modified]
+)
+@cached_response(GOALS, TASKS)
 async def get_goal(
     goal_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    fields: Optional[str] = None,
+    include: Optional[str] = None,
+    current_user: UserIdentity = Depends(get_current_identity),
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get a specific goal by ID."""
+    """Get a specific goal by ID.
+    
+    Accepts the same `fields`/`include` parameters as the goal list.
+    """
+    
+    projection = parse_goal_projection(fields, include)
+    if projection is None:
+        query = select(Goal).options(*goal_response_options())
+    else:
+        query = goal_projection_query(projection[0])
     
-    goal = db.query(Goal).filter(
+    result = await db.execute(query.where(
         Goal.id == goal_id,
         Goal.user_id == current_user.id
-    ).first()
+    ))
+    goal = result.scalars().first() if projection is None else result.first()
     
     if not goal:
         raise HTTPException(
@@ -60,21 +173,25 @@ async def get_goal(
             detail="Goal not found"
         )
     
-    return goal
+    if projection is None:
+        return goal
+    goals = await project_goals(db, [goal], *projection)
+    return goals[0]
 
 @router.put("/{goal_id}", response_model=GoalResponse)
 async def update_goal(
     goal_id: int,
     goal_update: GoalUpdate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserIdentity = Depends(get_current_identity),
+    db: AsyncSession = Depends(get_db)
 ):
     """Update a specific goal."""
     
-    goal = db.query(Goal).filter(
+    result = await db.execute(select(Goal).where(
         Goal.id == goal_id,
         Goal.user_id == current_user.id
-    ).first()
+    ))
+    goal = result.scalars().first()
     
     if not goal:
         raise HTTPException(
@@ -94,23 +211,24 @@ async def update_goal(
     if goal_update.priority is not None:
         goal.priority = goal_update.priority
     
-    db.commit()
-    db.refresh(goal)
+    await db.commit()
+    await invalidate_user_caches(current_user.id, GOALS)
     
-    return goal
+    return await load_goal_for_response(db, goal.id)
 
 @router.delete("/{goal_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_goal(
     goal_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserIdentity = Depends(get_current_identity),
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete a specific goal."""
     
-    goal = db.query(Goal).filter(
+    result = await db.execute(select(Goal).where(
         Goal.id == goal_id,
         Goal.user_id == current_user.id
-    ).first()
+    ))
+    goal = result.scalars().first()
     
     if not goal:
         raise HTTPException(
@@ -118,7 +236,9 @@ async def delete_goal(
             detail="Goal not found"
         )
     
-    db.delete(goal)
-    db.commit()
+    # Deleting the goal deletes its tasks, which fails if another request changed one meanwhile
+    await db.delete(goal)
+    await commit_or_conflict(db, "Goal was modified by another request, please retry")
+    await invalidate_user_caches(current_user.id, GOALS, TASKS)
     
-    return None 
\ No newline at end of file
+    return None
@@ -0,0 +1,175 @@
+from fastapi import APIRouter, Depends, Request
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+import logging
+from database import get_db
+from models import Goal, Task, TaskStatus, apply_bulk_task_writes
+from schemas import GoalCreate, TaskImport, ImportRowError, ImportResponse
+from auth_utils import get_current_identity, UserIdentity
+from response_cache_utils import invalidate_user_caches, GOALS, TASKS
+from export_utils import ExportFormat, RecordError, iter_lines, iter_ndjson_records, iter_csv_records
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Rows validated and inserted per transaction
+IMPORT_BATCH_SIZE = 500
+# Row errors returned in the response; the failed count is always exact
+MAX_REPORTED_ERRORS = 100
+
+def describe_validation_error(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in exc.errors()
+    )
+
+def parse_source_id(value) -> Optional[int]:
+    """Exported id of an imported goal (int or numeric string), or None if absent."""
+    if value is None:
+        return None
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            pass
+    raise ValueError(f"id must be an integer, got {value!r}")
+
+class ImportState:
+    """Running totals for one import, plus the exported-to-new goal id mapping."""
+    
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self.rows = 0
+        self.goals_imported = 0
+        self.tasks_imported = 0
+        self.failed = 0
+        self.batches = 0
+        self.errors: List[ImportRowError] = []
+        self.goal_id_map: Dict[int, int] = {}
+    
+    def fail(self, row: int, error: str):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(ImportRowError(row=row, error=error))
+
+async def import_batch(db: AsyncSession, state: ImportState, batch: List[Tuple[int, object]]):
+    """Validate one batch of records and insert it in a single transaction.
+    
+    Goals are inserted before tasks so tasks can reference goals from the same batch
+    by their exported id. A task's goal_id only resolves to a goal created by this
+    import; anything else (a goal row that failed or comes later) fails the task row.
+    """
+    goals: List[Tuple[int, GoalCreate, Optional[int]]] = []
+    tasks: List[Tuple[int, TaskImport]] = []
+    for row, record in batch:
+        if isinstance(record, RecordError):
+            state.fail(row, str(record))
+            continue
+        if not isinstance(record, dict):
+            state.fail(row, "Record must be an object")
+            continue
+        # Empty values fall back to the schema defaults
+        record = {key: value for key, value in record.items() if value is not None}
+        record_type = record.get("type") or ("task" if record.get("goal_id") is not None else "goal")
+        try:
+            if record_type == "goal":
+                goals.append((row, GoalCreate(**record), parse_source_id(record.get("id"))))
+            elif record_type == "task":
+                tasks.append((row, TaskImport(**record)))
+            else:
+                state.fail(row, f"Unknown record type: {record_type}")
+        except ValidationError as exc:
+            state.fail(row, describe_validation_error(exc))
+        except ValueError as exc:
+            state.fail(row, str(exc))
+    
+    if goals:
+        result = await db.execute(
+            insert(Goal).returning(Goal.id, sort_by_parameter_order=True),
+            [{**goal.model_dump(), "user_id": state.user_id} for _, goal, _ in goals]
+        )
+        for (_, _, source_id), goal_id in zip(goals, result.scalars().all()):
+            if source_id is not None:
+                state.goal_id_map[source_id] = goal_id
+        state.goals_imported += len(goals)
+    
+    rows = []
+    for row, task in tasks:
+        goal_id = state.goal_id_map.get(task.goal_id)
+        if goal_id is None:
+            state.fail(row, f"Goal {task.goal_id} is not among the goals imported so far")
+            continue
+        task_status = task.status or TaskStatus.NOT_STARTED
+        completed_at = None
+        if task_status == TaskStatus.COMPLETED:
+            completed_at = task.completed_at or datetime.now(timezone.utc)
+        rows.append({
+            **task.model_dump(exclude={"status", "completed_at"}),
+            "goal_id": goal_id,
+            "status": task_status,
+            "completed_at": completed_at,
+            "user_id": state.user_id,
+        })
+    
+    transitions = []
+    if rows:
+        result = await db.execute(insert(Task).returning(Task.created_at, sort_by_parameter_order=True), rows)
+        transitions = [
+            (None, (row["goal_id"], state.user_id, row["status"], created_at, row["completed_at"]))
+            for row, created_at in zip(rows, result.scalars().all())
+        ]
+        state.tasks_imported += len(rows)
+    
+    if goals or rows:
+        # Bulk INSERTs skip the ORM flush hooks
+        await db.run_sync(lambda session: apply_bulk_task_writes(session.connection(), transitions, [state.user_id]))
+    await db.commit()
+    state.batches += 1
+    logger.info(
+        "Import for user %s: %s rows processed, %s goals, %s tasks, %s failed",
+        state.user_id, state.rows, state.goals_imported, state.tasks_imported, state.failed
+    )
+
+@router.post("/", response_model=ImportResponse)
+async def import_data(
+    request: Request,
+    format: ExportFormat = ExportFormat.NDJSON,
+    current_user: UserIdentity = Depends(get_current_identity),
+    db: AsyncSession = Depends(get_db)
+):
+    """Import goals and tasks from an NDJSON or CSV request body in the export format.
+    
+    The body is parsed as it arrives and committed every IMPORT_BATCH_SIZE rows, so
+    earlier batches stay imported if a later one fails. Tasks whose goal_id matches an
+    imported goal's exported id are attached to the newly created goal; other tasks fail.
+    """
+    
+    records = iter_ndjson_records if format == ExportFormat.NDJSON else iter_csv_records
+    state = ImportState(current_user.id)
+    batch = []
+    try:
+        async for row, record in records(iter_lines(request.stream())):
+            state.rows += 1
+            batch.append((row, record))
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                await import_batch(db, state, batch)
+                batch = []
+        if batch:
+            await import_batch(db, state, batch)
+    finally:
+        if state.batches:
+            await invalidate_user_caches(current_user.id, GOALS, TASKS)
+    
+    return ImportResponse(
+        rows=state.rows,
+        goals_imported=state.goals_imported,
+        tasks_imported=state.tasks_imported,
+        failed=state.failed,
+        batches=state.batches,
+        errors=state.errors,
+        errors_truncated=state.failed > len(state.errors)
+    )
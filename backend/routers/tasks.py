@@ -1,26 +1,43 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from database import get_db
-from models import Task, Goal, User, TaskStatus
-from schemas import TaskCreate, TaskUpdate, TaskResponse
-from auth_utils import get_current_user
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import select, insert, update, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timezone
+from typing import List, Optional
+from database import get_db, commit_or_conflict
+from models import Task, Goal, TaskStatus, apply_bulk_task_writes
+from schemas import TaskCreate, TaskUpdate, TaskResponse, TaskStatusUpdate, BulkItemResult, BulkResponse
+from auth_utils import get_current_identity, UserIdentity
+from etag_utils import conditional_get
+from response_cache_utils import cached_response, invalidate_user_caches, TASKS
+from pagination_utils import DEFAULT_PAGE_SIZE, validate_limit, keyset_page, finish_page
 
 router = APIRouter()
+not_modified = Depends(conditional_get())
+
+MAX_BULK_ITEMS = 1000
+TASK_CONFLICT = "Task was modified by another request, please retry"
+
+def validate_bulk_size(items: list):
+    if not items or len(items) > MAX_BULK_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Between 1 and {MAX_BULK_ITEMS} items are allowed per request"
+        )
 
 @router.post("/", response_model=TaskResponse, status_code=status.HTTP_201_CREATED)
 async def create_task(
     task: TaskCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserIdentity = Depends(get_current_identity),
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new task."""
     
     # Verify that the goal belongs to the current user
-    goal = db.query(Goal).filter(
+    result = await db.execute(select(Goal.id).where(
         Goal.id == task.goal_id,
         Goal.user_id == current_user.id
-    ).first()
+    ))
+    goal = result.scalars().first()
     
     if not goal:
         raise HTTPException(
@@ -34,43 +51,180 @@ async def create_task(
         due_date=task.due_date,
         priority=task.priority,
         estimated_hours=task.estimated_hours,
-        goal_id=task.goal_id
+        goal_id=task.goal_id,
+        user_id=current_user.id
     )
     
     db.add(db_task)
-    db.commit()
-    db.refresh(db_task)
+    await db.commit()
+    await invalidate_user_caches(current_user.id, TASKS)
+    await db.refresh(db_task)
     
     return db_task
 
-@router.get("/", response_model=List[TaskResponse])
+@router.post("/bulk", response_model=BulkResponse)
+async def create_tasks_bulk(
+    tasks: List[TaskCreate],
+    current_user: UserIdentity = Depends(get_current_identity),
+    db: AsyncSession = Depends(get_db)
+):
+    """Create many tasks in one transaction, returning a result per item."""
+    
+    validate_bulk_size(tasks)
+    
+    # Verify ownership once per distinct goal
+    goal_ids = {task.goal_id for task in tasks}
+    result = await db.execute(select(Goal.id).where(
+        Goal.id.in_(goal_ids),
+        Goal.user_id == current_user.id
+    ))
+    owned_goal_ids = set(result.scalars().all())
+    
+    results = [None] * len(tasks)
+    rows, row_indexes = [], []
+    for index, task in enumerate(tasks):
+        if task.goal_id not in owned_goal_ids:
+            results[index] = BulkItemResult(index=index, success=False, error="Goal not found")
+            continue
+        rows.append({
+            "title": task.title,
+            "description": task.description,
+            "due_date": task.due_date,
+            "priority": task.priority,
+            "estimated_hours": task.estimated_hours,
+            "goal_id": task.goal_id,
+            "user_id": current_user.id,
+        })
+        row_indexes.append(index)
+    
+    if rows:
+        result = await db.execute(insert(Task).returning(Task.id, Task.created_at, sort_by_parameter_order=True), rows)
+        inserted = result.all()
+        for index, (task_id, _) in zip(row_indexes, inserted):
+            results[index] = BulkItemResult(index=index, id=task_id, success=True)
+        # Bulk INSERT skips the ORM flush hooks
+        transitions = [
+            (None, (row["goal_id"], current_user.id, TaskStatus.NOT_STARTED, created_at, None))
+            for row, (_, created_at) in zip(rows, inserted)
+        ]
+        await db.run_sync(lambda session: apply_bulk_task_writes(session.connection(), transitions))
+        await db.commit()
+        await invalidate_user_caches(current_user.id, TASKS)
+    
+    return BulkResponse(
+        succeeded=len(rows),
+        failed=len(tasks) - len(rows),
+        results=results
+    )
+
+@router.patch("/bulk/status", response_model=BulkResponse)
+async def update_task_status_bulk(
+    updates: List[TaskStatusUpdate],
+    current_user: UserIdentity = Depends(get_current_identity),
+    db: AsyncSession = Depends(get_db)
+):
+    """Update the status of many tasks in one transaction, returning a result per item.
+    
+    Follows the same rules as mark_completed/mark_in_progress/mark_not_started.
+    """
+    
+    validate_bulk_size(updates)
+    
+    # Locked on PostgreSQL; elsewhere the version conditions below skip rows changed since this read
+    result = await db.execute(select(
+        Task.id, Task.goal_id, Task.status, Task.created_at, Task.completed_at, Task.version
+    ).where(
+        Task.id.in_({item.id for item in updates}),
+        Task.user_id == current_user.id
+    ).with_for_update())
+    current = {row.id: row for row in result.all()}
+    new_status = {item.id: item.status for item in updates if item.id in current}
+    
+    updated = set()
+    if new_status:
+        # One UPDATE per target status
+        now = datetime.now(timezone.utc)
+        completed_at = {}
+        for task_status in set(new_status.values()):
+            read = [(task_id, current[task_id].version) for task_id, value in new_status.items() if value == task_status]
+            completed_at[task_status] = now if task_status == TaskStatus.COMPLETED else None
+            result = await db.execute(
+                update(Task).where(tuple_(Task.id, Task.version).in_(read)).values(
+                    status=task_status,
+                    completed_at=completed_at[task_status],
+                    version=Task.version + 1
+                ).returning(Task.id).execution_options(synchronize_session=False)
+            )
+            updated.update(result.scalars().all())
+        
+        # Bulk UPDATE skips the ORM flush hooks; only rows the UPDATEs matched changed
+        transitions = []
+        for task_id in updated:
+            row = current[task_id]
+            transitions.append((
+                (row.goal_id, current_user.id, row.status, row.created_at, row.completed_at),
+                (row.goal_id, current_user.id, new_status[task_id], row.created_at, completed_at[new_status[task_id]])
+            ))
+        if transitions:
+            await db.run_sync(lambda session: apply_bulk_task_writes(session.connection(), transitions))
+            await db.commit()
+            await invalidate_user_caches(current_user.id, TASKS)
+    
+    results = []
+    for index, item in enumerate(updates):
+        if item.id not in current:
+            results.append(BulkItemResult(index=index, id=item.id, success=False, error="Task not found"))
+        elif item.id not in updated:
+            results.append(BulkItemResult(index=index, id=item.id, success=False, error=TASK_CONFLICT))
+        else:
+            results.append(BulkItemResult(index=index, id=item.id, success=True))
+    
+    succeeded = sum(1 for item in results if item.success)
+    return BulkResponse(
+        succeeded=succeeded,
+        failed=len(results) - succeeded,
+        results=results
+    )
+
+@router.get("/", response_model=List[TaskResponse], dependencies=[not_modified])
+@cached_response(TASKS)
 async def get_tasks(
+    response: Response,
     goal_id: int = None,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    current_user: UserIdentity = Depends(get_current_identity),
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get all tasks for the current user, optionally filtered by goal."""
+    """Get tasks for the current user, optionally filtered by goal.
+    
+    Results are paginated; pass the X-Next-Cursor response header back as `cursor`.
+    """
     
-    query = db.query(Task).join(Goal).filter(Goal.user_id == current_user.id)
+    validate_limit(limit)
+    query = select(Task).where(Task.user_id == current_user.id)
     
     if goal_id:
-        query = query.filter(Task.goal_id == goal_id)
+        query = query.where(Task.goal_id == goal_id)
     
-    tasks = query.all()
+    result = await db.execute(keyset_page(query, Task.created_at, Task.id, cursor, limit))
+    tasks = finish_page(result.scalars().all(), "created_at", limit, response)
     return tasks
 
-@router.get("/{task_id}", response_model=TaskResponse)
+@router.get("/{task_id}", response_model=TaskResponse, dependencies=[not_modified])
+@cached_response(TASKS)
 async def get_task(
     task_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserIdentity = Depends(get_current_identity),
+    db: AsyncSession = Depends(get_db)
 ):
     """Get a specific task by ID."""
     
-    task = db.query(Task).join(Goal).filter(
+    result = await db.execute(select(Task).where(
         Task.id == task_id,
-        Goal.user_id == current_user.id
-    ).first()
+        Task.user_id == current_user.id
+    ))
+    task = result.scalars().first()
     
     if not task:
         raise HTTPException(
@@ -84,15 +238,18 @@ async def get_task(
 async def update_task(
     task_id: int,
     task_update: TaskUpdate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserIdentity = Depends(get_current_identity),
+    db: AsyncSession = Depends(get_db)
 ):
     """Update a specific task."""
     
-    task = db.query(Task).join(Goal).filter(
+    # Lock the row (PostgreSQL) so concurrent writes apply their counter deltas one at a time;
+    # elsewhere the version check at commit rejects the loser with 409
+    result = await db.execute(select(Task).where(
         Task.id == task_id,
-        Goal.user_id == current_user.id
-    ).first()
+        Task.user_id == current_user.id
+    ).with_for_update())
+    task = result.scalars().first()
     
     if not task:
         raise HTTPException(
@@ -100,6 +257,20 @@ async def update_task(
             detail="Task not found"
         )
     
+    # Move the task to another goal (must also belong to the current user)
+    if task_update.goal_id is not None and task_update.goal_id != task.goal_id:
+        result = await db.execute(select(Goal.id).where(
+            Goal.id == task_update.goal_id,
+            Goal.user_id == current_user.id
+        ))
+        if not result.scalars().first():
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Goal not found"
+            )
+        task.goal_id = task_update.goal_id
+        task.user_id = current_user.id
+    
     # Update fields if provided
     if task_update.title is not None:
         task.title = task_update.title
@@ -120,8 +291,8 @@ async def update_task(
         elif task_update.status == TaskStatus.NOT_STARTED:
             task.mark_not_started()
     
-    db.commit()
-    db.refresh(task)
+    await commit_or_conflict(db, TASK_CONFLICT, task)
+    await invalidate_user_caches(current_user.id, TASKS)
     
     return task
 
@@ -129,15 +300,18 @@ async def update_task(
 async def update_task_status(
     task_id: int,
     status: TaskStatus,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserIdentity = Depends(get_current_identity),
+    db: AsyncSession = Depends(get_db)
 ):
     """Update only the status of a task."""
     
-    task = db.query(Task).join(Goal).filter(
+    # Lock the row (PostgreSQL) so concurrent writes apply their counter deltas one at a time;
+    # elsewhere the version check at commit rejects the loser with 409
+    result = await db.execute(select(Task).where(
         Task.id == task_id,
-        Goal.user_id == current_user.id
-    ).first()
+        Task.user_id == current_user.id
+    ).with_for_update())
+    task = result.scalars().first()
     
     if not task:
         raise HTTPException(
@@ -153,23 +327,26 @@ async def update_task_status(
     elif status == TaskStatus.NOT_STARTED:
         task.mark_not_started()
     
-    db.commit()
-    db.refresh(task)
+    await commit_or_conflict(db, TASK_CONFLICT, task)
+    await invalidate_user_caches(current_user.id, TASKS)
     
     return task
 
 @router.delete("/{task_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_task(
     task_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserIdentity = Depends(get_current_identity),
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete a specific task."""
     
-    task = db.query(Task).join(Goal).filter(
+    # Lock the row (PostgreSQL) so concurrent writes apply their counter deltas one at a time;
+    # elsewhere the version check at commit rejects the loser with 409
+    result = await db.execute(select(Task).where(
         Task.id == task_id,
-        Goal.user_id == current_user.id
-    ).first()
+        Task.user_id == current_user.id
+    ).with_for_update())
+    task = result.scalars().first()
     
     if not task:
         raise HTTPException(
@@ -177,7 +354,8 @@ async def delete_task(
             detail="Task not found"
         )
     
-    db.delete(task)
-    db.commit()
+    await db.delete(task)
+    await commit_or_conflict(db, TASK_CONFLICT)
+    await invalidate_user_caches(current_user.id, TASKS)
     
     return None 
\ No newline at end of file
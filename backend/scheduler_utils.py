@@ -0,0 +1,119 @@
+"""
+Background scheduler for periodic aggregates.
+
+Every worker starts an AsyncIOScheduler from the app lifespan, but each run of
+a job first takes a lease in the scheduler_locks table, so only one worker
+(the leader) does the work; if it dies, another takes over once the lease
+expires. Runs are spread with random jitter.
+
+The user stats job walks active users in batches of USER_STATS_BATCH_SIZE and
+stores overdue/upcoming counts and streaks in user_stats_snapshots (see
+stats_utils.snapshot_user_stats). Set SCHEDULER_ENABLED=false to turn it off.
+"""
+import logging
+import os
+import random
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.interval import IntervalTrigger
+from sqlalchemy import select, insert, update, delete, or_
+from sqlalchemy.exc import IntegrityError
+from database import async_engine, AsyncSessionLocal
+from models import User, SchedulerLock
+from stats_utils import snapshot_user_stats
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() in ("1", "true", "yes")
+USER_STATS_INTERVAL = float(os.getenv("USER_STATS_INTERVAL", "60"))
+USER_STATS_JITTER = float(os.getenv("USER_STATS_JITTER", "10"))
+USER_STATS_BATCH_SIZE = int(os.getenv("USER_STATS_BATCH_SIZE", "500"))
+
+USER_STATS_JOB = "refresh_user_stats"
+# Identifies this worker process as a lease owner
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+async def acquire_lease(name: str, ttl: float, owner: str = WORKER_ID) -> bool:
+    """Take or renew the named lease for `ttl` seconds; False if another worker holds it."""
+    now = datetime.now(timezone.utc)
+    expires_at = now + timedelta(seconds=ttl)
+    async with async_engine.begin() as conn:
+        result = await conn.execute(update(SchedulerLock).where(
+            SchedulerLock.name == name,
+            or_(SchedulerLock.owner == owner, SchedulerLock.expires_at < now)
+        ).values(owner=owner, expires_at=expires_at))
+        if result.rowcount:
+            return True
+    try:
+        async with async_engine.begin() as conn:
+            await conn.execute(insert(SchedulerLock).values(name=name, owner=owner, expires_at=expires_at))
+        return True
+    except IntegrityError:
+        return False
+
+
+async def release_lease(name: str, owner: str = WORKER_ID) -> None:
+    async with async_engine.begin() as conn:
+        await conn.execute(delete(SchedulerLock).where(SchedulerLock.name == name, SchedulerLock.owner == owner))
+
+
+async def refresh_user_stats() -> int:
+    """Recompute the stats snapshot of every active user, batch by batch, if this worker is the leader."""
+    # Outlive the next run (including its jitter) so the leader keeps the lease between runs
+    lease_ttl = 2 * (USER_STATS_INTERVAL + USER_STATS_JITTER)
+    if not await acquire_lease(USER_STATS_JOB, lease_ttl):
+        return 0
+
+    refreshed = 0
+    last_id = 0
+    async with AsyncSessionLocal() as db:
+        while True:
+            result = await db.execute(
+                select(User.id, User.data_version)
+                .where(User.is_active.is_(True), User.id > last_id)
+                .order_by(User.id)
+                .limit(USER_STATS_BATCH_SIZE)
+            )
+            users = [tuple(row) for row in result.all()]
+            if not users:
+                break
+            refreshed += await snapshot_user_stats(db, users)
+            await db.commit()
+            last_id = users[-1][0]
+            # Long runs keep the lease while they work
+            await acquire_lease(USER_STATS_JOB, lease_ttl)
+    logger.info("Refreshed stats snapshots for %s users", refreshed)
+    return refreshed
+
+
+def start_scheduler() -> Optional[AsyncIOScheduler]:
+    """Start the background scheduler on the running event loop (None if disabled)."""
+    if not SCHEDULER_ENABLED:
+        return None
+    scheduler = AsyncIOScheduler(timezone=timezone.utc)
+    scheduler.add_job(
+        refresh_user_stats,
+        IntervalTrigger(seconds=USER_STATS_INTERVAL, jitter=USER_STATS_JITTER),
+        id=USER_STATS_JOB,
+        max_instances=1,
+        coalesce=True,
+        # Warm the snapshots soon after startup instead of waiting a full interval
+        next_run_time=datetime.now(timezone.utc) + timedelta(seconds=random.uniform(0, USER_STATS_JITTER)),
+    )
+    scheduler.start()
+    return scheduler
+
+
+async def stop_scheduler(scheduler: Optional[AsyncIOScheduler]) -> None:
+    """Stop the scheduler and hand the lease over to another worker."""
+    if scheduler is None:
+        return
+    scheduler.shutdown(wait=False)
+    await release_lease(USER_STATS_JOB)
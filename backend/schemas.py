@@ -1,6 +1,7 @@
 from pydantic import BaseModel, EmailStr, validator
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Dict
+import enum
 from models import TaskStatus
 
 # User schemas
@@ -45,6 +46,7 @@ class TaskCreate(TaskBase):
     goal_id: int
 
 class TaskUpdate(BaseModel):
+    goal_id: Optional[int] = None
     title: Optional[str] = None
     description: Optional[str] = None
     status: Optional[TaskStatus] = None
@@ -52,6 +54,21 @@ class TaskUpdate(BaseModel):
     priority: Optional[str] = None
     estimated_hours: Optional[float] = None
 
+class TaskStatusUpdate(BaseModel):
+    id: int
+    status: TaskStatus
+
+class BulkItemResult(BaseModel):
+    index: int
+    id: Optional[int] = None
+    success: bool
+    error: Optional[str] = None
+
+class BulkResponse(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[BulkItemResult]
+
 class TaskResponse(TaskBase):
     id: int
     status: TaskStatus
@@ -94,6 +111,46 @@ class GoalResponse(GoalBase):
     class Config:
         from_attributes = True
 
+class PartialGoalResponse(BaseModel):
+    """GoalResponse restricted to the fields requested with `fields=` / `include=tasks`.
+    
+    Only the fields that were requested are present in the serialized response.
+    """
+    id: int
+    title: Optional[str] = None
+    description: Optional[str] = None
+    deadline: Optional[datetime] = None
+    category: Optional[str] = None
+    priority: Optional[str] = None
+    user_id: Optional[int] = None
+    progress_percentage: Optional[float] = None
+    total_tasks: Optional[int] = None
+    completed_tasks: Optional[int] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    tasks: Optional[List[TaskResponse]] = None
+    
+    class Config:
+        from_attributes = True
+
+# Import schemas
+class TaskImport(TaskCreate):
+    status: Optional[TaskStatus] = None
+    completed_at: Optional[datetime] = None
+
+class ImportRowError(BaseModel):
+    row: int
+    error: str
+
+class ImportResponse(BaseModel):
+    rows: int
+    goals_imported: int
+    tasks_imported: int
+    failed: int
+    batches: int
+    errors: List[ImportRowError]
+    errors_truncated: bool = False
+
 # Dashboard schemas
 class DashboardStats(BaseModel):
     total_goals: int
@@ -102,6 +159,9 @@ class DashboardStats(BaseModel):
     in_progress_tasks: int
     overdue_tasks: int
     upcoming_deadlines: int
+    # Consecutive days (UTC) with at least one completed task
+    current_streak: int = 0
+    longest_streak: int = 0
 
 class DashboardResponse(BaseModel):
     stats: DashboardStats
@@ -109,6 +169,11 @@ class DashboardResponse(BaseModel):
     upcoming_tasks: List[TaskResponse]
 
 # Progress tracking schemas
+class ProgressGranularity(str, enum.Enum):
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+
 class ProgressData(BaseModel):
     date: datetime
     completed_tasks: int
@@ -117,4 +182,38 @@ class ProgressData(BaseModel):
 
 class ProgressResponse(BaseModel):
     progress_data: List[ProgressData]
-    total_days: int 
\ No newline at end of file
+    total_days: int 
+
+# Profiler schemas
+class ProfilerStart(BaseModel):
+    # Fraction of requests sampled per route template, e.g. {"/api/dashboard/": 0.2}
+    rates: Dict[str, float] = {}
+    # Fraction sampled on routes not listed in rates
+    default_rate: float = 0.0
+    interval_ms: float = 5.0
+    # Seconds before the session stops on its own (capped by PROFILER_MAX_DURATION)
+    duration: float = 60.0
+    
+    @validator("rates")
+    def validate_rates(cls, v):
+        if any(not 0 <= rate <= 1 for rate in v.values()):
+            raise ValueError("rates must be between 0 and 1")
+        return v
+    
+    @validator("default_rate")
+    def validate_default_rate(cls, v):
+        if not 0 <= v <= 1:
+            raise ValueError("default_rate must be between 0 and 1")
+        return v
+    
+    @validator("interval_ms")
+    def validate_interval(cls, v):
+        if not 1 <= v <= 1000:
+            raise ValueError("interval_ms must be between 1 and 1000")
+        return v
+    
+    @validator("duration")
+    def validate_duration(cls, v):
+        if v <= 0:
+            raise ValueError("duration must be positive")
+        return v
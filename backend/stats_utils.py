@@ -0,0 +1,243 @@
+"""
+Dashboard statistics provider.
+
+Dashboard counters are computed in a single conditional-aggregation query and
+kept in a per-user in-process cache. Write handlers in the goals and tasks
+routers invalidate a user's entry; entries also expire after
+DASHBOARD_STATS_MAX_STALENESS seconds so time-based counters (overdue tasks,
+upcoming deadlines) and writes made by other workers are picked up.
+Set DASHBOARD_STATS_MAX_STALENESS=0 to disable caching.
+
+Overdue tasks, upcoming deadlines and completion streaks are also precomputed
+for all active users by the background scheduler (see scheduler_utils). While a
+user's snapshot is younger than USER_STATS_MAX_AGE and no goal or task has been
+written since, those values are read from it instead of being recomputed.
+"""
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import func, case, and_, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import Task, Goal, TaskStatus, User, DailyProgress, UserStatsSnapshot
+from schemas import DashboardStats
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DASHBOARD_STATS_MAX_STALENESS = float(os.getenv("DASHBOARD_STATS_MAX_STALENESS", "30"))
+# Oldest precomputed snapshot (seconds) the dashboard will use
+USER_STATS_MAX_AGE = float(os.getenv("USER_STATS_MAX_AGE", "180"))
+
+
+def compute_streaks(days: Iterable[date], today: date) -> Tuple[int, int]:
+    """Return (current, longest) runs of consecutive days in the sorted `days`.
+    
+    The current streak counts if its last day is today or yesterday.
+    """
+    longest = run = 0
+    previous = None
+    for day in days:
+        run = run + 1 if previous is not None and day == previous + timedelta(days=1) else 1
+        longest = max(longest, run)
+        previous = day
+    current = run if previous is not None and previous >= today - timedelta(days=1) else 0
+    return current, longest
+
+
+def completion_days_query(user_ids: List[int]):
+    """Days with at least one completion, ordered per user, from the daily_progress rollup."""
+    return select(DailyProgress.user_id, DailyProgress.day).where(
+        DailyProgress.user_id.in_(user_ids),
+        DailyProgress.completed_tasks > 0
+    ).order_by(DailyProgress.user_id, DailyProgress.day)
+
+
+async def fresh_snapshot(db: AsyncSession, user_id: int) -> Optional[UserStatsSnapshot]:
+    """The user's precomputed stats, if recent and computed after their last write."""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=USER_STATS_MAX_AGE)
+    result = await db.execute(select(UserStatsSnapshot).join(User, User.id == UserStatsSnapshot.user_id).where(
+        UserStatsSnapshot.user_id == user_id,
+        UserStatsSnapshot.data_version == User.data_version,
+        UserStatsSnapshot.computed_at >= cutoff
+    ))
+    return result.scalars().first()
+
+
+async def snapshot_user_stats(db: AsyncSession, users: List[Tuple[int, int]]) -> int:
+    """Precompute overdue/upcoming counts and streaks for a batch of (user_id, data_version).
+    
+    Uses one grouped query per statistic for the whole batch and upserts one
+    snapshot row per user. The caller commits. Returns the number of users.
+    """
+    if not users:
+        return 0
+    user_ids = [user_id for user_id, _ in users]
+    now = datetime.now(timezone.utc)
+    today = now.date()
+    
+    result = await db.execute(select(Task.user_id, func.count(Task.id)).where(
+        Task.user_id.in_(user_ids),
+        Task.due_date < now,
+        Task.status != TaskStatus.COMPLETED
+    ).group_by(Task.user_id))
+    overdue = dict(result.all())
+    
+    result = await db.execute(select(Goal.user_id, func.count(Goal.id)).where(
+        Goal.user_id.in_(user_ids),
+        Goal.deadline >= now,
+        Goal.deadline <= now + timedelta(days=7)
+    ).group_by(Goal.user_id))
+    upcoming = dict(result.all())
+    
+    result = await db.execute(completion_days_query(user_ids))
+    days_by_user: Dict[int, List[date]] = {}
+    for user_id, day in result.all():
+        days_by_user.setdefault(user_id, []).append(day)
+    
+    rows = []
+    for user_id, data_version in users:
+        current_streak, longest_streak = compute_streaks(days_by_user.get(user_id, []), today)
+        rows.append({
+            "user_id": user_id,
+            "overdue_tasks": overdue.get(user_id, 0),
+            "upcoming_deadlines": upcoming.get(user_id, 0),
+            "current_streak": current_streak,
+            "longest_streak": longest_streak,
+            "data_version": data_version,
+            "computed_at": now,
+        })
+    
+    dialect_insert = postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert
+    stmt = dialect_insert(UserStatsSnapshot)
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[UserStatsSnapshot.user_id],
+        set_={column: stmt.excluded[column] for column in rows[0] if column != "user_id"}
+    ), rows)
+    return len(rows)
+
+
+async def compute_dashboard_stats(db: AsyncSession, user_id: int) -> DashboardStats:
+    """Compute all dashboard counters for a user in one query (goal counts as scalar subqueries).
+    
+    Overdue/upcoming counts and streaks come from the user's precomputed snapshot when it is fresh.
+    """
+    now = datetime.now(timezone.utc)
+    next_week = now + timedelta(days=7)
+    snapshot = await fresh_snapshot(db, user_id)
+    
+    def count_tasks_where(*conditions):
+        return func.coalesce(func.sum(case((and_(*conditions), 1), else_=0)), 0)
+    
+    total_goals = select(func.count(Goal.id)).where(Goal.user_id == user_id).scalar_subquery()
+    columns = [
+        total_goals,
+        func.count(Task.id),
+        count_tasks_where(Task.status == TaskStatus.COMPLETED),
+        count_tasks_where(Task.status == TaskStatus.IN_PROGRESS),
+    ]
+    if snapshot is None:
+        upcoming_deadlines = select(func.count(Goal.id)).where(
+            Goal.user_id == user_id,
+            Goal.deadline >= now,
+            Goal.deadline <= next_week
+        ).scalar_subquery()
+        columns += [
+            count_tasks_where(Task.due_date < now, Task.status != TaskStatus.COMPLETED),
+            upcoming_deadlines,
+        ]
+    
+    result = await db.execute(select(*columns).where(Task.user_id == user_id))
+    row = result.one()
+    
+    if snapshot is None:
+        overdue_tasks, upcoming = row[4], row[5]
+        result = await db.execute(completion_days_query([user_id]))
+        current_streak, longest_streak = compute_streaks([day for _, day in result.all()], now.date())
+    else:
+        overdue_tasks, upcoming = snapshot.overdue_tasks, snapshot.upcoming_deadlines
+        current_streak, longest_streak = snapshot.current_streak, snapshot.longest_streak
+    
+    return DashboardStats(
+        total_goals=row[0],
+        total_tasks=row[1],
+        completed_tasks=row[2],
+        in_progress_tasks=row[3],
+        overdue_tasks=overdue_tasks,
+        upcoming_deadlines=upcoming,
+        current_streak=current_streak,
+        longest_streak=longest_streak
+    )
+
+
+class DashboardStatsProvider:
+    """Per-user cache in front of compute_dashboard_stats.
+    
+    Entries are tagged with the users.data_version they were computed at and only
+    served for that version, so a write made through another worker (which cannot
+    invalidate this worker's entries) is never answered with stats from before it.
+    """
+    
+    def __init__(self, max_staleness: float = DASHBOARD_STATS_MAX_STALENESS):
+        self.max_staleness = max_staleness
+        self._entries: Dict[int, Tuple[float, int, DashboardStats]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    async def get(self, db: AsyncSession, user_id: int, data_version: int) -> DashboardStats:
+        """Return cached stats for a user at `data_version`, computing them if missing or stale.
+        
+        Pass the data version read at the start of the request (conditional_get returns it):
+        stats computed while a write commits are then stored under the older version.
+        """
+        cached = self._lookup(user_id, data_version)
+        if cached is not None:
+            self.hits += 1
+            return cached
+    
+        self.misses += 1
+        stats = await compute_dashboard_stats(db, user_id)
+        if self.max_staleness > 0:
+            with self._lock:
+                entry = self._entries.get(user_id)
+                # Never replace stats of a newer version with ones from an older request
+                if entry is None or entry[1] <= data_version:
+                    self._entries[user_id] = (time.monotonic(), data_version, stats)
+        return stats
+    
+    def invalidate(self, user_id: int) -> None:
+        """Drop the cached stats for a user after their goals or tasks change."""
+        with self._lock:
+            self._entries.pop(user_id, None)
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+    
+    def _lookup(self, user_id: int, data_version: int) -> Optional[DashboardStats]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            cached_at, cached_version, stats = entry
+            if cached_version != data_version:
+                return None
+            if time.monotonic() - cached_at > self.max_staleness:
+                del self._entries[user_id]
+                return None
+            return stats
+
+
+dashboard_stats = DashboardStatsProvider()
@@ -0,0 +1,17 @@
+import os
+import sys
+import tempfile
+import pytest
+
+# The database modules read their settings at import time, so configure them before any test imports the app
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test.db")
+os.environ.setdefault("SCHEDULER_ENABLED", "false")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="module")
+def client():
+    from main import app
+    from fastapi.testclient import TestClient
+    with TestClient(app) as client:
+        yield client
@@ -0,0 +1,102 @@
+"""
+TaggedCache on the Redis backend (against fakeredis) and on the memory backend:
+entry TTLs, tag-version invalidation and single-flight loading.
+"""
+import asyncio
+import pytest
+from fakeredis import FakeServer, aioredis
+from cache_utils import MemoryCacheBackend, RedisCacheBackend, TaggedCache
+
+
+def redis_cache(**kwargs) -> TaggedCache:
+    # A server per cache: fakeredis clients created without one share their data
+    return TaggedCache(RedisCacheBackend(aioredis.FakeRedis(server=FakeServer())), **kwargs)
+
+
+class Loader:
+    """Load function returning b"value-<n>" for the n-th call, optionally after a delay."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self) -> bytes:
+        self.calls += 1
+        value = f"value-{self.calls}".encode()
+        await asyncio.sleep(self.delay)
+        return value
+
+
+def test_redis_backend_stores_entries_with_a_ttl():
+    async def scenario():
+        cache, load = redis_cache(), Loader()
+        assert await cache.get_or_load("key", ["user:1:goals"], load, ttl=0.2) == b"value-1"
+        assert await cache.get_or_load("key", ["user:1:goals"], load, ttl=0.2) == b"value-1"
+        assert 0 < await cache.backend.client.pttl("learning_tracker:key") <= 200
+        await asyncio.sleep(0.3)
+        assert await cache.get_or_load("key", ["user:1:goals"], load, ttl=0.2) == b"value-2"
+        assert (cache.hits, cache.misses) == (1, 2)
+        await cache.close()
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("make_cache", [redis_cache, lambda: TaggedCache(MemoryCacheBackend())], ids=["redis", "memory"])
+def test_invalidating_a_tag_drops_only_entries_carrying_it(make_cache):
+    async def scenario():
+        cache, load = make_cache(), Loader()
+        assert await cache.get_or_load("goals", ["user:1:goals"], load) == b"value-1"
+        assert await cache.get_or_load("both", ["user:1:goals", "user:1:tasks"], load) == b"value-2"
+        assert await cache.get_or_load("tasks", ["user:1:tasks"], load) == b"value-3"
+
+        await cache.invalidate("user:1:tasks")
+        assert await cache.get_or_load("goals", ["user:1:goals"], load) == b"value-1"
+        assert await cache.get_or_load("both", ["user:1:goals", "user:1:tasks"], load) == b"value-4"
+        assert await cache.get_or_load("tasks", ["user:1:tasks"], load) == b"value-5"
+        await cache.close()
+
+    asyncio.run(scenario())
+
+
+def test_redis_backend_loads_concurrent_misses_once():
+    async def scenario():
+        cache, load = redis_cache(), Loader(delay=0.05)
+        values = await asyncio.gather(*(cache.get_or_load("key", ["user:1:goals"], load) for _ in range(10)))
+        assert set(values) == {b"value-1"}
+        assert load.calls == 1
+        assert (cache.misses, cache.coalesced) == (1, 9)
+        await cache.close()
+
+    asyncio.run(scenario())
+
+
+def test_waiters_take_over_when_the_loading_caller_is_cancelled():
+    async def scenario():
+        cache, load = redis_cache(), Loader(delay=0.05)
+        leader = asyncio.create_task(cache.get_or_load("key", ["user:1:goals"], load))
+        await asyncio.sleep(0.01)
+        waiters = [asyncio.create_task(cache.get_or_load("key", ["user:1:goals"], load)) for _ in range(5)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        values = await asyncio.gather(*waiters)
+        assert leader.cancelled()
+        # One waiter reloaded; the others shared its load
+        assert set(values) == {b"value-2"}
+        assert load.calls == 2
+        await cache.close()
+
+    asyncio.run(scenario())
+
+
+def test_memory_backend_evicts_tag_versions_without_reviving_entries():
+    async def scenario():
+        cache, load = TaggedCache(MemoryCacheBackend(maxsize=16, max_tags=2)), Loader()
+        assert await cache.get_or_load("key", ["user:1:goals"], load) == b"value-1"
+        await cache.invalidate("user:1:goals")
+        # Push the invalidated tag out of the bounded tag table
+        for user_id in range(2, 6):
+            await cache.invalidate(f"user:{user_id}:goals")
+        assert len(cache.backend._versions) == 2
+        assert await cache.get_or_load("key", ["user:1:goals"], load) == b"value-2"
+
+    asyncio.run(scenario())
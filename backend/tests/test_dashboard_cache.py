@@ -0,0 +1,29 @@
+"""
+Cached dashboard stats must not outlive a write, even when the write was handled
+by another worker (whose invalidation never reaches this worker's cache).
+"""
+import pytest
+from stats_utils import dashboard_stats
+
+
+@pytest.fixture(scope="module")
+def headers(client):
+    client.post("/api/auth/signup", json={"email": "bob@example.com", "username": "bob", "password": "pw123456"})
+    response = client.post("/api/auth/login", json={"username": "bob", "password": "pw123456"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_dashboard_stats_follow_writes_from_other_workers(client, headers, monkeypatch):
+    goal = client.post("/api/goals/", json={"title": "Goal"}, headers=headers).json()["id"]
+    before = client.get("/api/dashboard/", headers=headers)
+    assert before.json()["stats"]["total_tasks"] == 0
+
+    # A write through another worker bumps users.data_version but leaves this worker's entries in place
+    monkeypatch.setattr(dashboard_stats, "invalidate", lambda user_id: None)
+    client.post("/api/tasks/", json={"title": "Task", "goal_id": goal}, headers=headers)
+
+    after = client.get("/api/dashboard/", headers={**headers, "If-None-Match": before.headers["etag"]})
+    assert after.status_code == 200
+    body = after.json()
+    assert body["stats"]["total_tasks"] == 1
+    assert body["stats"]["total_tasks"] == sum(len(goal["tasks"]) for goal in body["recent_goals"])
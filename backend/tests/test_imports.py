@@ -0,0 +1,39 @@
+"""
+Imported tasks attach only to goals created earlier in the same import, never to
+an existing goal that happens to have the exported id.
+"""
+import json
+import pytest
+
+
+@pytest.fixture(scope="module")
+def headers(client):
+    client.post("/api/auth/signup", json={"email": "erin@example.com", "username": "erin", "password": "pw123456"})
+    response = client.post("/api/auth/login", json={"username": "erin", "password": "pw123456"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_tasks_only_attach_to_goals_from_the_same_import(client, headers, monkeypatch):
+    # One row per batch, so a goal row after its task is only seen in a later batch
+    monkeypatch.setattr("routers.imports.IMPORT_BATCH_SIZE", 1)
+    existing = client.post("/api/goals/", json={"title": "Existing"}, headers=headers).json()["id"]
+    first, late, invalid = existing + 1000, existing + 1001, existing + 1002
+    records = [
+        {"type": "goal", "id": first, "title": "Imported"},
+        {"type": "task", "goal_id": first, "title": "Attached"},
+        {"type": "task", "goal_id": late, "title": "Before its goal"},
+        {"type": "goal", "id": late, "title": "Late"},
+        # No title: the goal row fails validation
+        {"type": "goal", "id": invalid},
+        {"type": "task", "goal_id": invalid, "title": "Goal failed"},
+        # Exported id equal to a goal that already exists
+        {"type": "task", "goal_id": existing, "title": "Existing id"},
+    ]
+    response = client.post("/api/import/", content="\n".join(json.dumps(record) for record in records), headers=headers)
+    body = response.json()
+    assert (body["goals_imported"], body["tasks_imported"]) == (2, 1)
+    assert {error["row"] for error in body["errors"]} == {3, 5, 6, 7}
+
+    goals = {goal["title"]: goal for goal in client.get("/api/goals/?include=tasks", headers=headers).json()}
+    assert [task["title"] for task in goals["Imported"]["tasks"]] == ["Attached"]
+    assert goals["Existing"]["total_tasks"] == 0
@@ -0,0 +1,16 @@
+"""
+The app must keep working across lifespans in one process (test clients, reloads):
+shutdown closes the password hashing pool, and the next startup must get a new one.
+"""
+from fastapi.testclient import TestClient
+from main import app
+
+
+def test_password_hashing_survives_a_second_lifespan():
+    credentials = {"username": "carol", "password": "pw123456"}
+    with TestClient(app) as client:
+        assert client.post("/api/auth/signup", json={"email": "carol@example.com", **credentials}).status_code == 201
+    with TestClient(app) as client:
+        assert client.post("/api/auth/login", json=credentials).status_code == 200
+        signup = client.post("/api/auth/signup", json={"email": "dave@example.com", "username": "dave", "password": "pw123456"})
+        assert signup.status_code == 201
@@ -0,0 +1,63 @@
+"""
+Summed metrics across workers sharing METRICS_DIR: counters must not go backwards
+when a worker exits, while the exited worker's gauges disappear.
+"""
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import pytest
+import metrics_utils
+
+
+@pytest.fixture
+def metrics_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics_utils, "METRICS_DIR", str(tmp_path))
+    return tmp_path
+
+
+def worker_snapshot(jobs: int, queued: int) -> dict:
+    return {
+        "jobs_total": {"type": "counter", "help": "Jobs", "labelnames": ["kind"], "buckets": [], "samples": [[["email"], jobs]]},
+        "queue_depth": {"type": "gauge", "help": "Queued jobs", "labelnames": [], "buckets": [], "samples": [[[], queued]]},
+    }
+
+
+def sample(name: str) -> list:
+    return [line for line in metrics_utils.collect_metrics().splitlines() if line.startswith(name)]
+
+
+def test_exited_workers_keep_counting_towards_counters(metrics_dir):
+    workers = [subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"]) for _ in range(2)]
+    try:
+        for jobs, worker in zip((3, 4), workers):
+            (metrics_dir / f"worker-{worker.pid}.json").write_text(json.dumps(worker_snapshot(jobs, queued=5)))
+        assert sample("jobs_total") == ['jobs_total{kind="email"} 7']
+        assert sample("queue_depth") == ["queue_depth 10"]
+
+        workers[0].kill()
+        workers[0].wait()
+        assert sample("jobs_total") == ['jobs_total{kind="email"} 7']
+        assert sample("queue_depth") == ["queue_depth 5"]
+        assert not (metrics_dir / f"worker-{workers[0].pid}.json").exists()
+    finally:
+        workers[1].kill()
+        workers[1].wait()
+    assert sample("jobs_total") == ['jobs_total{kind="email"} 7']
+    assert sample("queue_depth") == []
+    assert sorted(os.listdir(metrics_dir)) == [".lock", "aggregate.json"]
+
+
+def test_stopping_the_export_folds_this_workers_counters(metrics_dir):
+    async def scenario():
+        task = metrics_utils.start_metrics_export()
+        await asyncio.sleep(0)
+        await metrics_utils.stop_metrics_export(task)
+
+    metrics_utils.http_requests.inc(("GET", "/test", "200"))
+    asyncio.run(scenario())
+    aggregate = json.loads((metrics_dir / "aggregate.json").read_text())
+    assert ["GET", "/test", "200"] in [labels for labels, _ in aggregate["http_requests_total"]["samples"]]
+    assert all(metric["type"] != "gauge" for metric in aggregate.values())
+    assert not os.path.exists(metrics_utils.worker_snapshot_path())
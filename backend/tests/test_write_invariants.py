@@ -0,0 +1,145 @@
+"""
+Stored goal counters and the daily_progress rollup must match a recount from the
+tasks table after any mix of ORM writes (flush hooks) and bulk writes
+(apply_bulk_task_writes).
+"""
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import pytest
+from sqlalchemy import select
+from database import engine
+from models import Goal, DailyProgress, recompute_goal_counters, rebuild_daily_progress
+
+
+@pytest.fixture(scope="module")
+def headers(client):
+    client.post("/api/auth/signup", json={"email": "alice@example.com", "username": "alice", "password": "pw123456"})
+    response = client.post("/api/auth/login", json={"username": "alice", "password": "pw123456"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def stored_and_recounted():
+    """Stored counters and rollup, then the same after recomputing them (rolled back)."""
+    def read(conn):
+        counters = conn.execute(select(Goal.id, Goal.total_tasks, Goal.completed_tasks).order_by(Goal.id)).all()
+        progress = conn.execute(
+            select(DailyProgress.user_id, DailyProgress.day, DailyProgress.created_tasks, DailyProgress.completed_tasks)
+            # Rows the hooks decremented to zero are equivalent to missing rows
+            .where((DailyProgress.created_tasks != 0) | (DailyProgress.completed_tasks != 0))
+            .order_by(DailyProgress.user_id, DailyProgress.day)
+        ).all()
+        return counters, progress
+
+    with engine.connect() as conn:
+        stored = read(conn)
+        recompute_goal_counters(conn)
+        rebuild_daily_progress(conn)
+        recounted = read(conn)
+        conn.rollback()
+    return stored, recounted
+
+
+def test_counters_and_rollup_match_recount_after_mixed_writes(client, headers):
+    goals = [client.post("/api/goals/", json={"title": f"Goal {n}"}, headers=headers).json()["id"] for n in range(3)]
+
+    # ORM writes
+    single = [
+        client.post("/api/tasks/", json={"title": f"Task {n}", "goal_id": goals[n % 3]}, headers=headers).json()["id"]
+        for n in range(6)
+    ]
+    client.patch(f"/api/tasks/{single[0]}/status?status=completed", headers=headers)
+    client.patch(f"/api/tasks/{single[1]}/status?status=completed", headers=headers)
+    client.put(f"/api/tasks/{single[1]}", json={"status": "in_progress"}, headers=headers)
+    client.delete(f"/api/tasks/{single[2]}", headers=headers)
+
+    # Bulk writes
+    response = client.post(
+        "/api/tasks/bulk", json=[{"title": f"Bulk {n}", "goal_id": goals[n % 2]} for n in range(10)], headers=headers
+    )
+    assert response.json()["failed"] == 0
+    bulk = [result["id"] for result in response.json()["results"]]
+    response = client.patch("/api/tasks/bulk/status", json=[
+        *({"id": task_id, "status": "completed"} for task_id in bulk[:6]),
+        {"id": single[3], "status": "completed"},
+        {"id": single[0], "status": "not_started"},
+    ], headers=headers)
+    assert response.json()["failed"] == 0
+    client.patch("/api/tasks/bulk/status", json=[{"id": bulk[0], "status": "in_progress"}], headers=headers)
+
+    completed_at = (datetime.now(timezone.utc) - timedelta(days=3)).isoformat()
+    records = [
+        {"type": "goal", "id": 900, "title": "Imported"},
+        {"type": "task", "goal_id": 900, "title": "Imported done", "status": "completed", "completed_at": completed_at},
+        {"type": "task", "goal_id": 900, "title": "Imported open"},
+        {"type": "task", "goal_id": 900, "title": "Imported done today", "status": "completed"},
+    ]
+    response = client.post("/api/import/", content="\n".join(json.dumps(record) for record in records), headers=headers)
+    assert response.json()["failed"] == 0
+
+    # More ORM writes on top of bulk-written rows
+    client.patch(f"/api/tasks/{bulk[1]}/status?status=not_started", headers=headers)
+    client.delete(f"/api/tasks/{bulk[2]}", headers=headers)
+    client.delete(f"/api/goals/{goals[1]}", headers=headers)
+
+    stored, recounted = stored_and_recounted()
+    assert stored == recounted
+    assert any(completed for _, _, completed in stored[0])
+    assert stored[1]
+
+
+def concurrently(*calls):
+    """Run the calls at the same time (the test client hands each to the app's event loop)."""
+    with ThreadPoolExecutor(len(calls)) as pool:
+        return [future.result() for future in [pool.submit(call) for call in calls]]
+
+
+def test_concurrent_writes_to_one_task_apply_once(client, headers):
+    """Counters and the rollup stay equal to a recount when requests race on the same task."""
+    goal = client.post("/api/goals/", json={"title": "Contended"}, headers=headers).json()["id"]
+    task, other = (client.post("/api/tasks/", json={"title": title, "goal_id": goal}, headers=headers).json()["id"]
+                   for title in ("Contended", "Other"))
+
+    responses = concurrently(*(
+        lambda: client.patch(f"/api/tasks/{task}/status?status=completed", headers=headers) for _ in range(10)
+    ))
+    assert {response.status_code for response in responses} <= {200, 409}
+    responses = concurrently(
+        *(lambda status=status: client.patch(f"/api/tasks/{other}/status?status={status}", headers=headers)
+          for status in ["completed", "in_progress", "not_started"] * 3),
+        lambda: client.put(f"/api/tasks/{other}", json={"status": "completed"}, headers=headers),
+        lambda: client.delete(f"/api/tasks/{other}", headers=headers),
+    )
+    assert {response.status_code for response in responses} <= {200, 204, 404, 409}
+
+    stored, recounted = stored_and_recounted()
+    counters = {goal_id: (total, completed) for goal_id, total, completed in stored[0]}
+    assert counters[goal][1] <= counters[goal][0]
+    assert stored == recounted
+
+
+def test_overlapping_bulk_status_updates_apply_once(client, headers):
+    goal = client.post("/api/goals/", json={"title": "Bulk contended"}, headers=headers).json()["id"]
+    response = client.post("/api/tasks/bulk", json=[{"title": f"Task {n}", "goal_id": goal} for n in range(20)], headers=headers)
+    tasks = [result["id"] for result in response.json()["results"]]
+
+    def bulk(status):
+        return lambda: client.patch("/api/tasks/bulk/status", json=[{"id": task_id, "status": status} for task_id in tasks],
+                                    headers=headers)
+
+    responses = concurrently(
+        *(bulk("completed") for _ in range(4)),
+        bulk("in_progress"),
+        *(lambda task_id=task_id: client.patch(f"/api/tasks/{task_id}/status?status=completed", headers=headers)
+          for task_id in tasks[:5]),
+    )
+    assert {response.status_code for response in responses} <= {200, 409}
+    # Items that lost a race are reported per item, never applied twice
+    for response in responses[:5]:
+        errors = {result["error"] for result in response.json()["results"] if not result["success"]}
+        assert errors <= {"Task was modified by another request, please retry"}
+
+    stored, recounted = stored_and_recounted()
+    counters = {goal_id: (total, completed) for goal_id, total, completed in stored[0]}
+    assert counters[goal][0] == 20 and counters[goal][1] <= 20
+    assert stored == recounted
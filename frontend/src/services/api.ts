@@ -31,9 +31,25 @@ api.interceptors.response.use(
   }
 );
 
+// List endpoints are paginated: follow the X-Next-Cursor header until every page is loaded
+const getAllPages = async <T>(url: string) => {
+  let response = await api.get<T[]>(url);
+  const data = [...response.data];
+  let cursor = response.headers['x-next-cursor'];
+  while (cursor) {
+    response = await api.get<T[]>(url, { params: { cursor } });
+    data.push(...response.data);
+    cursor = response.headers['x-next-cursor'];
+  }
+  return { ...response, data };
+};
+
+// The goal lists only need summary fields, not each goal's tasks
+const GOAL_SUMMARY_FIELDS = 'title,user_id,description,deadline,category,priority,progress_percentage,total_tasks,completed_tasks,created_at,updated_at';
+
 // Goals API
 export const goalService = {
-  getGoals: () => api.get<Goal[]>('/api/goals/'),
+  getGoals: () => getAllPages<Goal>(`/api/goals/?fields=${GOAL_SUMMARY_FIELDS}`),
   getGoal: (id: number) => api.get<Goal>(`/api/goals/${id}`),
   createGoal: (goal: GoalCreate) => api.post<Goal>('/api/goals/', goal),
   updateGoal: (id: number, goal: GoalUpdate) => api.put<Goal>(`/api/goals/${id}`, goal),
@@ -42,7 +58,7 @@ export const goalService = {
 
 // Tasks API
 export const taskService = {
-  getTasks: () => api.get<Task[]>('/api/tasks/'),
+  getTasks: () => getAllPages<Task>('/api/tasks/'),
   getTask: (id: number) => api.get<Task>(`/api/tasks/${id}`),
   createTask: (task: TaskCreate) => api.post<Task>('/api/tasks/', task),
   updateTask: (id: number, task: TaskUpdate) => api.put<Task>(`/api/tasks/${id}`, task),
@@ -78,7 +78,7 @@ export interface Goal {
   completed_tasks: number;
   created_at: string;
   updated_at: string;
-  tasks: Task[];
+  tasks?: Task[];
   category?: string;
   priority?: 'low' | 'medium' | 'high';
 }
@@ -110,6 +110,8 @@ export interface DashboardStats {
   in_progress_tasks: number;
   overdue_tasks: number;
   upcoming_deadlines: number;
+  current_streak: number;
+  longest_streak: number;
 }
 
 export interface DashboardData {